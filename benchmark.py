@@ -0,0 +1,364 @@
+import sys
+import os
+import csv
+import json
+import time
+import random
+import statistics
+import subprocess
+import asyncio
+import threading
+from datetime import date, timedelta
+
+import project
+
+
+#----------------------------------------------------- Synthetic data generator --------------------------------------------------
+# Writes the nine CSV files import expects at a chosen StudentUse size. Every other table is scaled
+# from that size and every foreign key points at a generated row. Popularity is skewed (Zipf-like):
+# a few students, projects and machines account for most of the usage, like in the real data.
+FIRST_NAMES = ['Megan', 'Jorge', 'Jasmine', 'Donna', 'Carrie', 'Benjamin', 'Alexander', 'Michael', 'Jennifer',
+               'Morgan', 'Richard', 'Samantha', 'Danielle', 'Alexis', 'Kendra', 'Andrew', 'Sabrina', 'Jessica', 'Susan']
+LAST_NAMES = ['Chang', 'Trujillo', 'Kelley', 'Davies', 'Jones', 'Garcia', 'Maldonado', 'Roberts', 'Nunez', 'Ramirez',
+              'Morgan', 'Murphy', 'Sims', 'Shea', 'Anthony', 'Cruz', 'George', 'Brennan', 'Johnson', 'Phillips']
+MIDDLE_NAMES = ['Tonga', 'Corsican', 'Turkmen', 'Tswana']
+EMAIL_DOMAINS = ['gmail.com', 'yahoo.com', 'hotmail.com', 'uci.edu']
+COURSE_WORDS = ['Computer', 'Graphics', 'Vision', 'Data', 'Management', 'Databases', 'Systems', 'Networks', 'Learning']
+QUARTERS = ['F23', 'W24', 'S24', 'F24', 'W25']
+FIRST_DAY = date(2020, 1, 1)
+DAY_SPAN = 5 * 365
+
+
+# Cumulative Zipf weights for n items, for random.choices(cum_weights=...)
+def zipf_cum_weights(n, exponent=1.1):
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** exponent
+        cum_weights.append(total)
+    return cum_weights
+
+
+def write_csv(folder, file_name, rows):
+    with open(os.path.join(folder, file_name), 'w', newline='') as file:
+        csv.writer(file, lineterminator='\n').writerows(rows)
+
+
+def generate(folder, use_rows, seed=122):
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+
+    student_count = max(15, use_rows // 10)
+    admin_count = max(5, use_rows // 5000)
+    machine_count = max(6, use_rows // 2000)
+    project_count = max(7, use_rows // 1000)
+    course_count = max(5, project_count // 3)
+
+    students = [f"s{i}" for i in range(student_count)]
+    admins = [f"a{i}" for i in range(admin_count)]
+    users = students + admins
+
+    def user_row(ucinetid):
+        middle = rng.choice(MIDDLE_NAMES) if rng.random() < 0.2 else "NULL"
+        return (ucinetid, rng.choice(FIRST_NAMES), middle, rng.choice(LAST_NAMES))
+
+    write_csv(folder, 'users.csv', (user_row(ucinetid) for ucinetid in users))
+    write_csv(folder, 'students.csv', ((ucinetid,) for ucinetid in students))
+    write_csv(folder, 'admins.csv', ((ucinetid,) for ucinetid in admins))
+    write_csv(folder, 'emails.csv', ((ucinetid, f"{ucinetid}.{n}@{rng.choice(EMAIL_DOMAINS)}")
+                                     for ucinetid in users for n in range(rng.randint(1, 6))))
+    write_csv(folder, 'courses.csv', ((str(c), " ".join(rng.sample(COURSE_WORDS, 3)), rng.choice(QUARTERS))
+                                      for c in range(1, course_count + 1)))
+
+    course_weights = zipf_cum_weights(course_count)
+    courses = list(range(1, course_count + 1))
+    write_csv(folder, 'projects.csv', ((str(p), f"project-{p}", f"Description of project {p}",
+                                        str(rng.choices(courses, cum_weights=course_weights)[0]))
+                                       for p in range(1, project_count + 1)))
+    write_csv(folder, 'machines.csv', ((str(m), f"host{m}", f"10.{m // 65536 % 256}.{m // 256 % 256}.{m % 256}",
+                                        "Active" if rng.random() < 0.85 else "Down", f"DBH {1000 + m % 200}")
+                                       for m in range(1, machine_count + 1)))
+    write_csv(folder, 'manage.csv', ((admin, str(m)) for m in range(1, machine_count + 1)
+                                     for admin in rng.sample(admins, rng.randint(1, min(3, admin_count)))))
+
+    # Number of StudentUse rows per student, skewed towards a few heavy users. A student can use
+    # every (project, machine) pair at most once, which bounds the rows one student can get.
+    max_per_student = project_count * machine_count
+    per_student = [0] * student_count
+    student_weights = zipf_cum_weights(student_count, 0.8)
+    remaining = use_rows
+    while remaining:
+        for index in rng.choices(range(student_count), cum_weights=student_weights, k=min(remaining, 100000)):
+            if per_student[index] < max_per_student:
+                per_student[index] += 1
+                remaining -= 1
+
+    project_weights = zipf_cum_weights(project_count)
+    machine_weights = zipf_cum_weights(machine_count, 0.7)
+    projects = list(range(1, project_count + 1))
+    machines = list(range(1, machine_count + 1))
+
+    # The j-th use of a student walks machines first, then projects, from a skewed starting pair,
+    # so the (UCINetID, project_id, machine_id) primary key never repeats
+    def use_rows_of(index):
+        project_start = rng.choices(projects, cum_weights=project_weights)[0]
+        machine_start = rng.choices(machines, cum_weights=machine_weights)[0]
+        for j in range(per_student[index]):
+            start = FIRST_DAY + timedelta(days=rng.randrange(DAY_SPAN))
+            end = start + timedelta(days=min(int(rng.expovariate(0.7)), 14))
+            yield ((project_start - 1 + j // machine_count) % project_count + 1,
+                   students[index],
+                   (machine_start - 1 + j) % machine_count + 1,
+                   start.isoformat(), end.isoformat())
+
+    write_csv(folder, 'use.csv', (row for index in range(student_count) for row in use_rows_of(index)))
+    return {"use_rows": use_rows, "students": student_count, "admins": admin_count, "machines": machine_count,
+            "projects": project_count, "courses": course_count}
+#----------------------------------------------------- End of Synthetic data generator --------------------------------------------------
+
+
+#----------------------------------------------------- Benchmark harness --------------------------------------------------
+# Times import and every command against a dataset folder over one connection and prints a JSON
+# record (or writes it to --output) that can be compared across commits with `compare`.
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def first_csv_row(folder, file_name):
+    with open(os.path.join(folder, file_name), 'r') as file:
+        return next(csv.reader(file))
+
+
+# Run function(*args) `repeat` times with its printed output captured, returns timing statistics
+def time_call(repeat, function, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        project.capture_output(function, *args)
+        timings.append(time.perf_counter() - start)
+    return {"runs": repeat, "min": min(timings), "median": statistics.median(timings), "mean": statistics.mean(timings)}
+
+
+# Time a write command with fresh parameters on every run
+def time_writes(repeat, function, connection, make_args):
+    timings = []
+    for n in range(repeat):
+        args = make_args(n)
+        start = time.perf_counter()
+        project.capture_output(function, connection, *args)
+        timings.append(time.perf_counter() - start)
+    return {"runs": repeat, "min": min(timings), "median": statistics.median(timings), "mean": statistics.mean(timings)}
+
+
+def run_benchmark(folder, repeat=5, strategy="batch", batch_size=1000):
+    connection = project.create_database_connection(*project.DB_CONFIG)
+    results = {"commit": git_commit(), "backend": project.DB_BACKEND, "folder": os.path.abspath(folder),
+               "rows": {}, "import": None, "commands": {}}
+    for table in project.IMPORT_TABLES_IN_ORDER:
+        with open(os.path.join(folder, project.csv_file_for(table)), 'rb') as file:
+            results["rows"][table] = sum(1 for line in file if line.strip())
+
+    start = time.perf_counter()
+    _, load_stats = project.capture_output(project.import_data, folder, connection, strategy, batch_size)
+    results["import"] = {"seconds": time.perf_counter() - start, "strategy": strategy,
+                         "tables": {table: {"rows": rows, "seconds": seconds} for table, rows, seconds in load_stats}}
+
+    use = first_csv_row(folder, 'use.csv')
+    course_id = first_csv_row(folder, 'projects.csv')[3]
+    commands = results["commands"]
+    commands["listCourse"] = time_call(repeat, project.listCourse, connection, use[1])
+    commands["popularCourse"] = time_call(repeat, project.popularCourse, connection, 10)
+    commands["adminEmails"] = time_call(repeat, project.adminEmail, connection, use[2])
+    commands["activeStudent"] = time_call(repeat, project.activeStudents, connection, use[2], "2020-01-01", "2024-12-31", 1)
+    commands["machineUsage"] = time_call(repeat, project.numMachineUsage, connection, course_id)
+    commands["insertStudent"] = time_writes(repeat, project.insert_student, connection,
+                                            lambda n: (f"bench{n}", f"bench{n}@uci.edu", "Bench", "NULL", "Mark"))
+    commands["addEmail"] = time_writes(repeat, project.add_email, connection,
+                                       lambda n: (f"bench{n}", f"bench{n}.extra@uci.edu"))
+    commands["insertMachine"] = time_writes(repeat, project.insert_machine, connection,
+                                            lambda n: (f"bench{n}", f"bench{n}", "10.255.255.1", "Active", "DBH 0"))
+    commands["insertUse"] = time_writes(repeat, project.insert_use, connection,
+                                        lambda n: (use[0], use[1], f"bench{n}", "2024-01-01", "2024-01-02"))
+    commands["updateCourse"] = time_writes(repeat, project.updateCourse, connection,
+                                           lambda n: (course_id, f"Benchmark title {n}"))
+    commands["deleteStudent"] = time_writes(repeat, project.delete_student, connection, lambda n: (f"bench{n}",))
+    connection.close()
+    return results
+
+
+# Print the median of every timing in two result files side by side
+def compare(before_path, after_path):
+    with open(before_path, 'r') as file:
+        before = json.load(file)
+    with open(after_path, 'r') as file:
+        after = json.load(file)
+    print(f"benchmark,{before.get('commit')},{after.get('commit')},ratio")
+    rows = [("import", before["import"]["seconds"], after["import"]["seconds"])]
+    for command, timing in before["commands"].items():
+        if command in after["commands"]:
+            rows.append((command, timing["median"], after["commands"][command]["median"]))
+    for name, old, new in rows:
+        print(f"{name},{old:.6f},{new:.6f},{new / old if old else float('inf'):.2f}")
+
+
+# Wall time of whole `python3 project.py ...` processes, for commands that exit before touching
+# the database and, with --db, for one query. Startup is dominated by imports and connecting.
+def run_startup_benchmark(repeat=10, db=None):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "project.py")
+    scenarios = {
+        "import_module": [sys.executable, "-c", "import sys; sys.path.insert(0, sys.argv[1]); import project",
+                          os.path.dirname(script)],
+        "usage": [sys.executable, script],
+        "invalid_command": [sys.executable, script, "bogus"],
+        "usage_error": [sys.executable, script, "import"],
+    }
+    if db:
+        scenarios["popularCourse"] = [sys.executable, script, "popularCourse", "1",
+                                      f"--backend={project.DB_BACKEND}", f"--db={db}"]
+    results = {"commit": git_commit(), "repeat": repeat, "startup": {}}
+    for name, command in scenarios.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        results["startup"][name] = {"runs": repeat, "min": min(timings), "median": statistics.median(timings),
+                                    "mean": statistics.mean(timings)}
+    return results
+
+
+# Throughput of the same mix of listCourse / activeStudents calls run one after another on one
+# connection and fanned out through the asyncio API. Runs against an already imported database.
+def run_async_benchmark(calls=200, pool_size=8, limit=32):
+    connection = project.create_database_connection(*project.DB_CONFIG)
+    cursor = connection.cursor()
+    cursor.execute("SELECT DISTINCT UCINetID FROM StudentUse ORDER BY UCINetID;")
+    students = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT machine_id FROM Machines ORDER BY machine_id;")
+    machines = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    workload = []
+    for n in range(calls):
+        if n % 2:
+            workload.append(("activeStudents", (machines[n % len(machines)], "2020-01-01", "2024-12-31", 1)))
+        else:
+            workload.append(("listCourse", (students[n % len(students)],)))
+
+    start = time.perf_counter()
+    for name, args in workload:
+        project.capture_output(getattr(project, name), connection, *args)
+    sync_seconds = time.perf_counter() - start
+    connection.close()
+
+    async def fan_out():
+        async with project.AsyncConnectionPool(lambda: project.create_database_connection(*project.DB_CONFIG),
+                                               pool_size) as pool:
+            start = time.perf_counter()
+            await project.gather_bounded([getattr(project, "async_" + name)(pool, *args) for name, args in workload],
+                                         limit)
+            return time.perf_counter() - start
+
+    async_seconds = asyncio.run(fan_out())
+    return {"commit": git_commit(), "backend": project.DB_BACKEND, "calls": calls, "pool_size": pool_size,
+            "limit": limit, "sync": {"seconds": sync_seconds, "calls_per_second": calls / sync_seconds},
+            "async": {"seconds": async_seconds, "calls_per_second": calls / async_seconds}}
+
+
+# Throughput of insertMachine calls made by `threads` threads at once: first with one commit per call on
+# a connection per thread (how the commands run today), then group-committed through a WritePipeline.
+def run_write_benchmark(operations=400, threads=8, group_size=64, group_delay=0.005):
+    connect = lambda: project.create_database_connection(*project.DB_CONFIG)
+
+    def run_phase(prefix, call):
+        machine_ids = [f"{prefix}{n}" for n in range(operations)]
+        failures = []
+
+        def worker(chunk):
+            for machine_id in chunk:
+                output, _ = call(machine_id)
+                if "Success" not in output:
+                    failures.append(machine_id)
+
+        workers = [threading.Thread(target=worker, args=(machine_ids[n::threads],)) for n in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        seconds = time.perf_counter() - start
+        return {"seconds": seconds, "operations_per_second": operations / seconds, "failures": len(failures)}
+
+    local = threading.local()
+    connections = []
+
+    def per_call(machine_id):
+        if not hasattr(local, "connection"):
+            local.connection = connect()
+            connections.append(local.connection)
+        return project.capture_output(project.insert_machine, local.connection, machine_id, machine_id,
+                                      "10.0.0.1", "Active", "DBH 0")
+
+    results = {"commit": git_commit(), "backend": project.DB_BACKEND, "operations": operations, "threads": threads,
+               "group_size": group_size, "group_delay": group_delay}
+    results["commit_per_call"] = run_phase("wb-call-", per_call)
+    for connection in connections:
+        connection.close()
+
+    pipeline = project.WritePipeline(connect, group_size, group_delay)
+    results["pipeline"] = run_phase("wb-pipe-", lambda machine_id: pipeline.call(
+        project.insert_machine, machine_id, machine_id, "10.0.0.1", "Active", "DBH 0"))
+    results["pipeline"]["groups"] = pipeline.groups
+    pipeline.close()
+
+    connection = connect()
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM Machines WHERE machine_id LIKE 'wb-%';")
+    connection.commit()
+    cursor.close()
+    connection.close()
+    return results
+#----------------------------------------------------- End of Benchmark harness --------------------------------------------------
+
+
+def main():
+    args, options = project.parse_flags(sys.argv[1:])
+    project.configure_backend(options)
+    command = args[0] if args else None
+
+    if command == "generate" and len(args) == 2:
+        summary = generate(args[1], int(options.get("use-rows", 1000)), int(options.get("seed", 122)))
+        print(json.dumps(summary))
+    elif command == "run" and len(args) == 2:
+        results = run_benchmark(args[1], int(options.get("repeat", 5)), options.get("strategy", "batch"),
+                                int(options.get("batch-size", 1000)))
+        if "output" in options:
+            with open(options["output"], 'w') as file:
+                json.dump(results, file, indent=2)
+        else:
+            print(json.dumps(results, indent=2))
+    elif command == "startup" and len(args) == 1:
+        print(json.dumps(run_startup_benchmark(int(options.get("repeat", 10)), options.get("db")), indent=2))
+    elif command == "async" and len(args) == 1:
+        print(json.dumps(run_async_benchmark(int(options.get("calls", 200)), int(options.get("pool-size", 8)),
+                                             int(options.get("limit", 32))), indent=2))
+    elif command == "writes" and len(args) == 1:
+        print(json.dumps(run_write_benchmark(int(options.get("operations", 400)), int(options.get("threads", 8)),
+                                             int(options.get("group-size", 64)),
+                                             float(options.get("group-delay", 5)) / 1000), indent=2))
+    elif command == "compare" and len(args) == 3:
+        compare(args[1], args[2])
+    else:
+        print("Usage: python3 benchmark.py generate [folder] [--use-rows=N] [--seed=S]")
+        print("       python3 benchmark.py run [folder] [--repeat=N] [--strategy=row|batch|infile] [--batch-size=N] [--output=file] [--backend=mysql|sqlite] [--db=path]")
+        print("       python3 benchmark.py startup [--repeat=N] [--backend=mysql|sqlite --db=path]")
+        print("       python3 benchmark.py async [--calls=N] [--pool-size=N] [--limit=N] [--backend=mysql|sqlite --db=path]")
+        print("       python3 benchmark.py writes [--operations=N] [--threads=N] [--group-size=N] [--group-delay=ms] [--backend=mysql|sqlite --db=path]")
+        print("       python3 benchmark.py compare [before.json] [after.json]")
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,424 @@
 
 import sys
 import csv
+import io
 import os
-import mysql.connector
-from mysql.connector import Error
+import re
+import json
+import hashlib
+import shlex
+import time
+import queue
+import socket
+import threading
+import socketserver
+import functools
+import collections
+from datetime import datetime
 
-# Function to connect to the MySQL database
-def create_database_connection(host_name, user_name, user_password, db_name):
-    connection = None
-    try:
-        connection = mysql.connector.connect(
+# Connection settings used by main() and by the extra connections of a parallel import.
+# DB_BACKEND picks the storage engine; for 'sqlite' the database name is a file path (or :memory:).
+DB_CONFIG = ("localhost", 'test', 'password', "cs122a")  # Remember Update with our own credentials
+DB_BACKEND = "mysql"
+
+
+#----------------------------------------------------- Storage backends --------------------------------------------------
+# Every command talks to the database through a BackendConnection. It hands out cursors that
+# translate the MySQL dialect the queries are written in for the backend in use, and that raise
+# driver errors as Error, so the command functions work unchanged on MySQL and on embedded SQLite.
+
+# Database error raised by every backend
+class Error(Exception):
+    pass
+
+
+# The drivers are imported on first use, so commands that never reach the database
+# (usage errors, --server forwarding) don't pay for importing them.
+class MySQLBackend:
+    name = "mysql"
+    supports_infile = True
+    supports_parallel_load = True
+    supports_partitioning = True
+    supports_backup = False  # snapshots are table dumps restored with LOAD DATA
+    index_names_query = "SELECT DISTINCT INDEX_NAME FROM information_schema.statistics WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s;"
+
+    @property
+    def driver_errors(self):
+        import mysql.connector
+        return (mysql.connector.Error,)
+
+    def connect(self, host_name, user_name, user_password, db_name):
+        import mysql.connector
+        return mysql.connector.connect(
             host=host_name,
             user=user_name,
             password=user_password,
-            database=db_name
+            database=db_name,
+            allow_local_infile=True,  # needed by the 'infile' import strategy
+            use_pure=not mysql.connector.HAVE_CEXT  # the C extension when it is installed
         )
+
+    def translate(self, query):
+        return query
+
+    # Server-side prepared statement: parsed once, then only the parameters travel on every execute
+    def prepared_cursor(self, raw_connection):
+        return raw_connection.cursor(prepared=True)
+
+    def execute(self, raw_connection, raw_cursor, query, params):
+        if params is None:
+            raw_cursor.execute(query)
+        else:
+            raw_cursor.execute(query, params)
+
+
+class SQLiteBackend:
+    name = "sqlite"
+    supports_infile = False  # no LOAD DATA, the 'infile' strategy falls back to 'batch'
+    supports_parallel_load = False  # SQLite has a single writer
+    supports_partitioning = False  # no PARTITION BY, import --partition-by keeps the plain table
+    supports_backup = True  # snapshots are page copies through the online backup API
+    index_names_query = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s;"
+
+    @property
+    def driver_errors(self):
+        import sqlite3
+        return (sqlite3.Error,)
+
+    def connect(self, host_name, user_name, user_password, db_name):
+        import sqlite3
+        # Columns declared `date` come back as datetime.date, like they do from MySQL
+        raw_connection = sqlite3.connect(db_name, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        raw_connection.execute("PRAGMA foreign_keys=ON;")
+        return raw_connection
+
+    @functools.lru_cache(maxsize=256)
+    def translate(self, query):
+        query = query.replace("%s", "?")
+        query = re.sub(r"SET FOREIGN_KEY_CHECKS\s*=\s*0", "PRAGMA foreign_keys=OFF", query)
+        query = re.sub(r"SET FOREIGN_KEY_CHECKS\s*=\s*1", "PRAGMA foreign_keys=ON", query)
+        query = re.sub(r"GROUP_CONCAT\((.+?)\s+SEPARATOR\s+('[^']*')\)", r"GROUP_CONCAT(\1, \2)", query)
+        query = re.sub(r"^(\s*)EXPLAIN\s+", r"\1EXPLAIN QUERY PLAN ", query)
+        query = re.sub(r"ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET", query)
+        # MySQL's default collation compares text case-insensitively, which NOCASE matches for ASCII.
+        # Unlike a MySQL char(n) column, SQLite keeps and compares trailing spaces.
+        query = re.sub(r"\b((?:var)?char\(\d+\))", r"\1 COLLATE NOCASE", query, flags=re.IGNORECASE)
+        return query
+
+    # sqlite3 already keeps the compiled statements of a connection in its own cache
+    def prepared_cursor(self, raw_connection):
+        return raw_connection.cursor()
+
+    def execute(self, raw_connection, raw_cursor, query, params):
+        # PRAGMA foreign_keys is ignored inside a transaction, so finish the open one first
+        if query.startswith("PRAGMA foreign_keys") and raw_connection.in_transaction:
+            raw_connection.commit()
+        raw_cursor.execute(query, params or ())
+
+
+BACKENDS = {'mysql': MySQLBackend(), 'sqlite': SQLiteBackend()}
+
+
+# Prepared driver cursors of a connection by query text, shared by its cursors. Statements with IN lists
+# have a different text for every list length, so at most max_statements are kept and the least recently
+# used one is closed, which releases it on the server, when another is needed.
+class PreparedStatements:
+    def __init__(self, backend, raw_connection, max_statements=64):
+        self.backend = backend
+        self.raw_connection = raw_connection
+        self.max_statements = max_statements
+        self.cursors = collections.OrderedDict()  # query -> prepared driver cursor
+
+    def cursor(self, query):
+        raw_cursor = self.cursors.get(query)
+        if raw_cursor is not None:
+            self.cursors.move_to_end(query)
+            return raw_cursor
+        while len(self.cursors) >= self.max_statements:
+            self.close_cursor(self.cursors.popitem(last=False)[1])
+        raw_cursor = self.cursors[query] = self.backend.prepared_cursor(self.raw_connection)
+        return raw_cursor
+
+    def close_cursor(self, raw_cursor):
+        try:
+            raw_cursor.close()
+        except self.backend.driver_errors:
+            pass
+
+    def close(self):
+        while self.cursors:
+            self.close_cursor(self.cursors.popitem()[1])
+
+
+class BackendCursor:
+    def __init__(self, backend, raw_connection, raw_cursor, statements=None):
+        self.backend = backend
+        self.raw_connection = raw_connection
+        self.raw_cursor = raw_cursor
+        self.own_cursor = raw_cursor
+        self.statements = statements  # PreparedStatements of the connection, shared by its cursors
+
+    def execute(self, query, params=None):
+        profiler = PROFILER
+        start = time.perf_counter()
+        self.raw_cursor = self.own_cursor
+        if self.statements is not None and params is not None:
+            self.raw_cursor = self.statements.cursor(query)
+        try:
+            self.backend.execute(self.raw_connection, self.raw_cursor, self.backend.translate(query), params)
+        except self.backend.driver_errors as e:
+            if profiler is not None:
+                profiler.record_error(query, e)
+            raise Error(str(e)) from e
+        finally:
+            if profiler is not None:
+                profiler.record_statement(query, params, time.perf_counter() - start, self.raw_cursor.rowcount, 1)
+
+    def executemany(self, query, seq_params):
+        profiler = PROFILER
+        start = time.perf_counter()
+        self.raw_cursor = self.own_cursor  # keeps the driver's multi-row INSERT rewrite
+        try:
+            self.raw_cursor.executemany(self.backend.translate(query), seq_params)
+        except self.backend.driver_errors as e:
+            if profiler is not None:
+                profiler.record_error(query, e)
+            raise Error(str(e)) from e
+        finally:
+            if profiler is not None:
+                # MySQL sends a multi-row INSERT in one round trip, anything else once per parameter set
+                round_trips = 1 if query.lstrip().upper().startswith("INSERT") else len(seq_params)
+                profiler.record_statement(query, None, time.perf_counter() - start, self.raw_cursor.rowcount, round_trips)
+
+    # Call a fetch method of the driver cursor, timing it when profiling
+    def fetch(self, method, *args):
+        profiler = PROFILER
+        start = time.perf_counter()
+        try:
+            result = method(*args)
+        except self.backend.driver_errors as e:
+            if profiler is not None:
+                profiler.record_error("fetch", e)
+            raise Error(str(e)) from e
+        if profiler is not None:
+            profiler.record_fetch(time.perf_counter() - start, 1 if isinstance(result, tuple) else len(result or ()))
+        return result
+
+    def fetchone(self):
+        return self.fetch(self.raw_cursor.fetchone)
+
+    def fetchmany(self, size):
+        return self.fetch(self.raw_cursor.fetchmany, size)
+
+    def fetchall(self):
+        return self.fetch(self.raw_cursor.fetchall)
+
+    @property
+    def rowcount(self):
+        return self.raw_cursor.rowcount
+
+    @property
+    def description(self):
+        return self.raw_cursor.description
+
+    def close(self):
+        try:
+            self.own_cursor.close()
+        except self.backend.driver_errors as e:
+            raise Error(str(e)) from e
+
+
+class BackendConnection:
+    def __init__(self, backend, raw_connection):
+        self.backend = backend
+        self.raw_connection = raw_connection
+        self.statements = None
+
+    # From now on every parameterized statement runs on a prepared cursor kept for its query text,
+    # so repeated commands reuse the statements the server has already prepared
+    def reuse_prepared_statements(self, max_statements=64):
+        if self.statements is None:
+            self.statements = PreparedStatements(self.backend, self.raw_connection, max_statements)
+
+    def cursor(self):
+        try:
+            return BackendCursor(self.backend, self.raw_connection, self.raw_connection.cursor(), self.statements)
+        except self.backend.driver_errors as e:
+            raise Error(str(e)) from e
+
+    def commit(self):
+        try:
+            self.raw_connection.commit()
+        except self.backend.driver_errors as e:
+            raise Error(str(e)) from e
+
+    def rollback(self):
+        try:
+            self.raw_connection.rollback()
+        except self.backend.driver_errors as e:
+            raise Error(str(e)) from e
+
+    def close(self):
+        if self.statements is not None:
+            self.statements.close()
+        self.raw_connection.close()
+#----------------------------------------------------- End of Storage backends --------------------------------------------------
+
+
+#----------------------------------------------------- Profiling --------------------------------------------------
+# With --profile every command records where its time went: connecting, executing statements,
+# fetching rows and everything else (formatting the output). It also counts round trips, rows read
+# and written, keeps the database errors the commands swallow, and runs EXPLAIN for statements slower
+# than --profile-slow milliseconds. The record is printed as one JSON line to stderr, or appended
+# to the file given as --profile=path.
+class Profiler:
+    def __init__(self, slow_seconds=0.1, max_slow=20):
+        self.slow_seconds = slow_seconds
+        self.max_slow = max_slow
+        self.connect_seconds = 0.0
+        self.execute_seconds = 0.0
+        self.fetch_seconds = 0.0
+        self.round_trips = 0
+        self.rows_read = 0
+        self.rows_written = 0
+        self.statements = collections.OrderedDict()  # normalized SQL -> {count, seconds, rows}
+        self.slow = []  # (seconds, sql, params, rows)
+        self.errors = []
+        self.paused = False
+        self.lock = threading.Lock()
+
+    def record_statement(self, query, params, seconds, rowcount, round_trips):
+        if self.paused:
+            return
+        sql = " ".join(query.split())
+        rows = max(rowcount or 0, 0)
+        with self.lock:
+            self.execute_seconds += seconds
+            self.round_trips += round_trips
+            if sql.upper().startswith(("INSERT", "UPDATE", "DELETE", "LOAD")):
+                self.rows_written += rows
+            summary = self.statements.setdefault(sql[:200], {"count": 0, "seconds": 0.0, "rows": 0})
+            summary["count"] += 1
+            summary["seconds"] += seconds
+            summary["rows"] += rows
+            if seconds >= self.slow_seconds:
+                self.slow.append((seconds, query, params, rows))
+                self.slow.sort(key=lambda item: -item[0])
+                del self.slow[self.max_slow:]
+
+    def record_fetch(self, seconds, rows):
+        if self.paused:
+            return
+        with self.lock:
+            self.fetch_seconds += seconds
+            self.rows_read += rows
+
+    def record_error(self, query, error):
+        with self.lock:
+            self.errors.append({"sql": " ".join(query.split())[:200], "error": str(error)})
+
+    # Plans of the slow SELECT statements, run with recording paused
+    def explain_slow(self, connection):
+        plans = []
+        self.paused = True
+        try:
+            for seconds, query, params, rows in self.slow:
+                entry = {"sql": " ".join(query.split()), "seconds": seconds, "rows": rows, "plan": None}
+                if query.lstrip().upper().startswith("SELECT") and connection is not None:
+                    cursor = connection.cursor()
+                    try:
+                        cursor.execute("EXPLAIN " + query.strip(), params)
+                        columns = [column[0] for column in cursor.description]
+                        entry["plan"] = [dict(zip(columns, map(str, row))) for row in cursor.fetchall()]
+                    except Error as e:
+                        entry["plan"] = f"EXPLAIN failed: {e}"
+                    finally:
+                        cursor.close()
+                plans.append(entry)
+        finally:
+            self.paused = False
+        return plans
+
+    def report(self, argv, total_seconds, connection):
+        return {
+            "command": argv[1] if len(argv) > 1 else None,
+            "argv": argv[1:],
+            "backend": DB_BACKEND,
+            "total_seconds": total_seconds,
+            "connect_seconds": self.connect_seconds,
+            "execute_seconds": self.execute_seconds,
+            "fetch_seconds": self.fetch_seconds,
+            "format_seconds": max(total_seconds - self.connect_seconds - self.execute_seconds - self.fetch_seconds, 0.0),
+            "round_trips": self.round_trips,
+            "rows_read": self.rows_read,
+            "rows_written": self.rows_written,
+            "statements": [dict(sql=sql, **summary) for sql, summary in self.statements.items()],
+            "errors": self.errors,
+            "slow_statements": self.explain_slow(connection),
+        }
+
+
+# Set by --profile; None means no instrumentation
+PROFILER = None
+
+
+def write_profile(destination, record):
+    line = json.dumps(record, default=str)
+    if destination:
+        with open(destination, 'a') as file:
+            file.write(line + "\n")
+    else:
+        print(line, file=sys.stderr)
+#----------------------------------------------------- End of Profiling --------------------------------------------------
+
+
+# Function to connect to the database (MySQL unless another backend is selected)
+def create_database_connection(host_name, user_name, user_password, db_name, backend=None):
+    backend = BACKENDS[backend or DB_BACKEND]
+    connection = None
+    try:
+        connection = BackendConnection(backend, backend.connect(host_name, user_name, user_password, db_name))
         
-        #print("MySQL Database connection successful")
-    except Error as e:
+        #print("Database connection successful")
+    except backend.driver_errors as e:
         print(f"The error '{e}' occurred")
 
     return connection
 
 
+# Connection that is only opened when a command first uses it, so a usage error
+# or a command that never touches the database exits without connecting
+class LazyConnection:
+    def __init__(self, connect):
+        self.connect = connect
+        self.connection = None
+
+    def open(self):
+        if self.connection is None:
+            start = time.perf_counter()
+            self.connection = self.connect()
+            if PROFILER is not None:
+                PROFILER.connect_seconds += time.perf_counter() - start
+        return self.connection
+
+    # cursor(), commit(), backend, ... of the real connection
+    def __getattr__(self, name):
+        return getattr(self.open(), name)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+# Select the backend from --backend=mysql|sqlite and --db=path (or PROJECT_BACKEND / PROJECT_DB)
+def configure_backend(options):
+    global DB_BACKEND, DB_CONFIG
+    DB_BACKEND = options.get("backend", os.environ.get("PROJECT_BACKEND", DB_BACKEND))
+    if DB_BACKEND == "sqlite":
+        DB_CONFIG = (None, None, None, options.get("db", os.environ.get("PROJECT_DB", "cs122a.db")))
+
+
 
 # Function to execute a query in the database
 def execute_query(connection, query):
@@ -35,109 +431,1084 @@ def execute_query(connection, query):
         print(f"The error '{e}' occurred")
 
 
+# Strategies understood by load_csv:
+#   row    - one INSERT per CSV line (the original behaviour, kept as a fallback)
+#   batch  - multi-row INSERTs of batch_size rows through executemany()
+#   infile - stream the whole file through LOAD DATA LOCAL INFILE
+LOAD_STRATEGIES = ['row', 'batch', 'infile']
+
+
+# Map a table name to the CSV file holding its rows (StudentUse is stored as use.csv)
+def csv_file_for(table):
+    if table == "StudentUse":
+        return "use.csv"
+    return f"{table.lower()}.csv"
+
+
+# Split command-line arguments into positional values and --key=value / --flag options
+def parse_flags(args):
+    positional = []
+    options = {}
+    for arg in args:
+        if arg.startswith("--"):
+            key, _, value = arg[2:].partition("=")
+            options[key] = value if value else True
+        else:
+            positional.append(arg)
+    return positional, options
+
+
+# Read a CSV file in chunks of about chunk_size lines starting at a byte offset.
+# Yields (rows, end_offset) so callers can record exactly how far the file has been consumed;
+# a chunk never ends inside a quoted field that spans several lines.
+def iter_csv_chunks(file_path, offset=0, chunk_size=1000):
+    with open(file_path, 'rb') as file:
+        file.seek(offset)
+        lines = []
+        in_quotes = False
+        for line in file:
+            offset += len(line)
+            lines.append(line.decode('utf-8'))
+            if line.count(b'"') % 2:
+                in_quotes = not in_quotes
+            if not in_quotes and len(lines) >= chunk_size:
+                yield [row for row in csv.reader(lines) if row], offset
+                lines = []
+        if lines:
+            yield [row for row in csv.reader(lines) if row], offset
+
+
+# Load one CSV file into a table with the given strategy, returns (table, rows loaded, seconds taken).
+# The row and batch strategies start reading at `offset` and call on_chunk(end_offset, rows) after each chunk.
+def load_csv(cursor, table, file_path, strategy="batch", batch_size=1000, offset=0, on_chunk=None):
+    start = time.perf_counter()
+
+    if strategy == "infile":
+        # LOAD DATA reads the file client side and streams it in one statement.
+        # It reads an unquoted NULL field as SQL NULL, so every field goes through a user variable and
+        # NULL is put back as the string 'NULL', and backslashes are kept as they are, like the csv module does.
+        with open(file_path, 'rb') as file:
+            line_terminator = "\\r\\n" if b"\r\n" in file.readline() else "\\n"
+        columns, _ = table_columns(table)
+        infile_query = f"""LOAD DATA LOCAL INFILE %s INTO TABLE `{table}`
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '{line_terminator}'
+            ({', '.join(f'@{column}' for column in columns)})
+            SET {', '.join(f"{column} = IFNULL(@{column}, 'NULL')" for column in columns)};"""
+        cursor.execute(infile_query, (os.path.abspath(file_path),))
+        rows_loaded = cursor.rowcount
+    else:
+        rows_loaded = 0
+        for rows, end_offset in iter_csv_chunks(file_path, offset, batch_size):
+            if rows:
+                # Dynamically construct the INSERT INTO statement based on the structure of the CSV file
+                insert_query = f"INSERT INTO `{table}` VALUES ({', '.join(['%s'] * len(rows[0]))});"
+                if strategy == "row":
+                    for row in rows:
+                        cursor.execute(insert_query, tuple(row))
+                else:
+                    # executemany() rewrites the INSERT into a single multi-row statement
+                    cursor.executemany(insert_query, [tuple(row) for row in rows])
+                rows_loaded += len(rows)
+            if on_chunk is not None:
+                on_chunk(end_offset, len(rows))
+
+    return table, rows_loaded, time.perf_counter() - start
+
+
+#----------------------------------------------------- Import checkpoints --------------------------------------------------
+# A streaming import commits every N rows and records, per table, the CSV file, the byte offset
+# reached and the rows loaded so far. An interrupted import can then resume from that point.
+CHECKPOINT_FILE = ".import_checkpoint.json"
+
+
+def read_checkpoint(checkpoint_path):
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, 'r') as file:
+        return json.load(file)
+
+
+def write_checkpoint(checkpoint_path, checkpoint):
+    # Write to a temporary file first so a crash never leaves a half written checkpoint behind
+    temp_path = checkpoint_path + ".tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(checkpoint, file, indent=2)
+    os.replace(temp_path, checkpoint_path)
+
+
+# Guards the checkpoint file when several import workers commit at the same time
+CHECKPOINT_LOCK = threading.Lock()
+
+
+# Record the progress of one chunk; once commit_every rows are pending, commit them and save the checkpoint.
+# `pending` holds the uncommitted offset and row count of the table, so the saved file only ever
+# describes committed work even while other connections are still loading other tables.
+def advance_checkpoint(connection, checkpoint_path, checkpoint, table, pending, end_offset, rows, commit_every):
+    pending["offset"] = end_offset
+    pending["rows"] += rows
+    if pending["rows"] >= commit_every:
+        commit_checkpoint(connection, checkpoint_path, checkpoint, table, pending)
+
+
+def commit_checkpoint(connection, checkpoint_path, checkpoint, table, pending, done=False):
+    connection.commit()
+    with CHECKPOINT_LOCK:
+        progress = checkpoint["tables"][table]
+        progress["offset"] = pending["offset"]
+        progress["rows"] += pending["rows"]
+        progress["done"] = done
+        write_checkpoint(checkpoint_path, checkpoint)
+    pending["rows"] = 0
+#----------------------------------------------------- End of Import checkpoints --------------------------------------------------
+
+
+#----------------------- ------------------------ Schema --------------------------------------------------
+#To avoid foreign key constraint errors when dropping tables
+# Define the order of table deletion, ensuring dependent tables are deleted first
+TABLES_TO_DROP_IN_ORDER = [
+    'ImportFingerprints', 'CoursePopularity', 'CourseStudents',
+    'Had','StudentUse', 'Manage',
+    'Projects', 'Emails', 'Students', 'Admins',
+    'Machines', 'Courses', 'Users'
+]
+
+CREATE_TABLE_QUERIES = {
+    'Users': """CREATE TABLE IF NOT EXISTS Users (UCINetID char(50) NOT NULL, FirstName varchar(50), MiddleName varchar(50), LastName varchar(50), PRIMARY KEY(UCINetID));""",
+    'Emails': """CREATE TABLE IF NOT EXISTS Emails (UCINetID char(50), email_address varchar(50), PRIMARY KEY(UCINetID, email_address), FOREIGN KEY(UCINetID) REFERENCES Users(UCINetID) ON DELETE CASCADE);""",
+    'Students': """CREATE TABLE IF NOT EXISTS Students (UCINetID char(50) NOT NULL, PRIMARY KEY(UCINetID), FOREIGN KEY(UCINetID) REFERENCES Users(UCINetID));""",
+    'Admins': """CREATE TABLE IF NOT EXISTS Admins (admin_UCINetID char(50) NOT NULL, PRIMARY KEY(admin_UCINetID), FOREIGN KEY(admin_UCINetID) REFERENCES Users(UCINetID));""",
+    'Courses': """CREATE TABLE IF NOT EXISTS Courses (course_id char(50) NOT NULL, title varchar(255), quarter varchar(20), PRIMARY KEY(course_id));""",
+    'Projects': """CREATE TABLE IF NOT EXISTS Projects (project_id char(50) NOT NULL, project_name varchar(100), project_description TEXT, course_id char(50) NOT NULL,  PRIMARY KEY(project_id), FOREIGN KEY(course_id) REFERENCES Courses(course_id));""",
+    'Machines': """CREATE TABLE IF NOT EXISTS Machines (machine_id char(50) NOT NULL, hostname varchar(255), IP_address varchar(15), operational_status varchar(50), location varchar(255), PRIMARY KEY(machine_id));""",
+    'Had': """CREATE TABLE IF NOT EXISTS Had(project_id char(50), course_id char(50), PRIMARY KEY(project_id), FOREIGN KEY(project_id) REFERENCES Projects(project_id), FOREIGN KEY(course_id) REFERENCES Courses(course_id)); """,
+    'StudentUse': """CREATE TABLE IF NOT EXISTS StudentUse (project_id char(50), UCINetID char(50), machine_id char(50), start_date date, end_date date, PRIMARY KEY(UCINetID, project_id, machine_id), FOREIGN KEY(UCINetID) REFERENCES Users(UCINetID), FOREIGN KEY(project_id) REFERENCES Projects(project_id), FOREIGN KEY(machine_id) REFERENCES Machines(machine_id));""",
+    'Manage': """CREATE TABLE IF NOT EXISTS Manage (admin_UCINetID char(50), machine_id char(50), PRIMARY KEY(admin_UCINetID, machine_id), FOREIGN KEY(admin_UCINetID) REFERENCES Admins(admin_UCINetID), FOREIGN KEY(machine_id) REFERENCES Machines(machine_id));""",
+    # Maintained aggregate behind popularCourse: StudentUse rows per (course, student), and distinct students per course
+    'CourseStudents': """CREATE TABLE IF NOT EXISTS CourseStudents (course_id char(50) NOT NULL, UCINetID char(50) NOT NULL, use_count int NOT NULL, PRIMARY KEY(course_id, UCINetID));""",
+    'CoursePopularity': """CREATE TABLE IF NOT EXISTS CoursePopularity (course_id char(50) NOT NULL, student_count int NOT NULL, PRIMARY KEY(course_id));""",
+    # Size, modification time and content hash of every CSV file at its last import, used by incremental imports
+    'ImportFingerprints': """CREATE TABLE IF NOT EXISTS ImportFingerprints (file_name varchar(255) NOT NULL, file_size bigint NOT NULL, mtime double NOT NULL, content_hash char(64) NOT NULL, PRIMARY KEY(file_name));"""
+}
+
+# Secondary indexes for the access paths of the query commands. import_data builds them only after
+# the bulk load has finished, so the load itself does not have to maintain them row by row.
+#   StudentUse(machine_id, start_date, end_date) - activeStudent: machine plus date window
+#   StudentUse(machine_id, end_date, start_date) - activeStudent --overlap: uses still running at the window start
+#   StudentUse(project_id)                       - popularCourse / machineUsage / listCourse join to Projects
+#   Projects(course_id)                          - popularCourse / machineUsage / listCourse join to Courses
+#   Manage(machine_id)                           - adminEmails: admins of one machine
+#   CourseStudents(UCINetID)                     - refreshing the aggregate for a student
+#   CoursePopularity(student_count, course_id)   - popularCourse: top-N read in index order
+SECONDARY_INDEXES = {
+    'StudentUse': [('idx_studentuse_machine_dates', 'machine_id, start_date, end_date'),
+                   ('idx_studentuse_machine_end', 'machine_id, end_date, start_date'),
+                   ('idx_studentuse_project', 'project_id')],
+    'Projects': [('idx_projects_course', 'course_id')],
+    'Manage': [('idx_manage_machine', 'machine_id')],
+    'CourseStudents': [('idx_coursestudents_user', 'UCINetID')],
+    'CoursePopularity': [('idx_coursepopularity_count', 'student_count, course_id')],
+}
+
+# Tables loaded from CSV files: Users first, then the remaining files in this order
+IMPORT_TABLES_IN_ORDER = ['Users', 'Admins', 'Students', 'Emails', 'Courses', 'Projects', 'Machines', 'StudentUse', 'Manage']
+
+
+# Indexes that already exist are skipped, so a resumed import can run this again
+def create_secondary_indexes(cursor):
+    for table, indexes in SECONDARY_INDEXES.items():
+        cursor.execute(cursor.backend.index_names_query, (table,))
+        existing = {row[0] for row in cursor.fetchall()}
+        for index_name, columns in indexes:
+            if index_name not in existing:
+                cursor.execute(f"CREATE INDEX {index_name} ON `{table}` ({columns});")
+
+
+# Optional range partitioning of StudentUse by start_date (import --partition-by=month|quarter|year, MySQL only).
+# A window query with bounds on start_date then only reads the partitions of the window. MySQL requires the
+# partitioning column in every unique key and allows no foreign keys on a partitioned table, so this layout
+# has start_date in the primary key and leaves the references of StudentUse unchecked by the database.
+PARTITION_PERIODS = ['month', 'quarter', 'year']
+
+PARTITIONED_STUDENT_USE_QUERY = """CREATE TABLE IF NOT EXISTS StudentUse (project_id char(50), UCINetID char(50), machine_id char(50), start_date date NOT NULL, end_date date, PRIMARY KEY(UCINetID, project_id, machine_id, start_date))
+    PARTITION BY RANGE COLUMNS(start_date) ({partitions});"""
+
+
+# Partition name and exclusive upper bound of every period from first to last, plus a catch-all partition
+def partition_bounds(first, last, period):
+    months = {'month': 1, 'quarter': 3, 'year': 12}[period]
+    year, month = first.year, (first.month - 1) // months * months + 1
+    bounds = []
+    while (year, month) <= (last.year, last.month):
+        if period == 'month':
+            name = f"p{year}m{month:02d}"
+        elif period == 'quarter':
+            name = f"p{year}q{(month - 1) // 3 + 1}"
+        else:
+            name = f"p{year}"
+        year, month = (year + 1, month + months - 12) if month + months > 12 else (year, month + months)
+        bounds.append((name, f"'{year:04d}-{month:02d}-01'"))
+    bounds.append(("pmax", "MAXVALUE"))
+    return bounds
+
+
+# DDL of the partitioned StudentUse, with periods covering the start dates of the folder's use.csv
+def partitioned_student_use_query(folder_name, period):
+    first = last = None
+    with open(os.path.join(folder_name, csv_file_for('StudentUse')), 'r') as file:
+        for row in csv.reader(file):
+            if len(row) > 3 and is_date(row[3]):
+                start_date = datetime.strptime(row[3], "%Y-%m-%d").date()
+                first = start_date if first is None or start_date < first else first
+                last = start_date if last is None or start_date > last else last
+    bounds = partition_bounds(first, last, period) if first else [("pmax", "MAXVALUE")]
+    partitions = ", ".join(f"PARTITION {name} VALUES LESS THAN ({bound})" for name, bound in bounds)
+    return PARTITIONED_STUDENT_USE_QUERY.format(partitions=partitions)
+#----------------------- ------------------------ End of Schema --------------------------------------------------
+
+
+#----------------------------------------------------- Course popularity aggregate --------------------------------------------------
+# CourseStudents counts the StudentUse rows of every (course, student) pair and CoursePopularity the
+# distinct students per course, so popularCourse is a top-N read instead of a three-way join.
+# import_data rebuilds both tables, insert_use and delete_student keep them up to date incrementally.
+def rebuild_course_popularity(cursor):
+    cursor.execute("DELETE FROM CoursePopularity;")
+    cursor.execute("DELETE FROM CourseStudents;")
+    cursor.execute("""INSERT INTO CourseStudents (course_id, UCINetID, use_count)
+        SELECT P.course_id, U.UCINetID, COUNT(*)
+        FROM StudentUse U JOIN Projects P ON U.project_id = P.project_id
+        GROUP BY P.course_id, U.UCINetID;""")
+    cursor.execute("""INSERT INTO CoursePopularity (course_id, student_count)
+        SELECT course_id, COUNT(*) FROM CourseStudents GROUP BY course_id;""")
+
+
+# Count one more StudentUse row of a student on a project
+def add_course_use(cursor, proj_id, ucinetid):
+    cursor.execute("SELECT course_id FROM Projects WHERE project_id = %s;", (proj_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return
+    course_id = row[0]
+    # Upserts, so concurrent first uses of a course or student don't both try to insert the row
+    cursor.execute("""INSERT INTO CourseStudents (course_id, UCINetID, use_count) VALUES (%s, %s, 1)
+        ON DUPLICATE KEY UPDATE use_count = use_count + 1;""", (course_id, ucinetid))
+    cursor.execute("SELECT use_count FROM CourseStudents WHERE course_id = %s AND UCINetID = %s;", (course_id, ucinetid))
+    if cursor.fetchone()[0] > 1:
+        return
+    # First use of this course by the student: one more distinct student for the course
+    cursor.execute("""INSERT INTO CoursePopularity (course_id, student_count) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE student_count = student_count + 1;""", (course_id,))
+
+
+# Recompute the aggregate rows of some students from their current StudentUse rows,
+# after their usage history was (possibly) removed
+def refresh_course_students(cursor, ucinetids):
+    placeholders = ", ".join(["%s"] * len(ucinetids))
+    params = tuple(ucinetids)
+    cursor.execute(f"""UPDATE CoursePopularity SET student_count = student_count - (
+            SELECT COUNT(*) FROM CourseStudents CS WHERE CS.course_id = CoursePopularity.course_id AND CS.UCINetID IN ({placeholders}))
+        WHERE course_id IN (SELECT course_id FROM CourseStudents WHERE UCINetID IN ({placeholders}));""", params + params)
+    cursor.execute(f"DELETE FROM CourseStudents WHERE UCINetID IN ({placeholders});", params)
+    cursor.execute(f"""INSERT INTO CourseStudents (course_id, UCINetID, use_count)
+        SELECT P.course_id, U.UCINetID, COUNT(*)
+        FROM StudentUse U JOIN Projects P ON U.project_id = P.project_id
+        WHERE U.UCINetID IN ({placeholders})
+        GROUP BY P.course_id, U.UCINetID;""", params)
+    cursor.execute(f"""UPDATE CoursePopularity SET student_count = student_count + (
+            SELECT COUNT(*) FROM CourseStudents CS WHERE CS.course_id = CoursePopularity.course_id AND CS.UCINetID IN ({placeholders}))
+        WHERE course_id IN (SELECT course_id FROM CourseStudents WHERE UCINetID IN ({placeholders}));""", params + params)
+    cursor.execute(f"""INSERT INTO CoursePopularity (course_id, student_count)
+        SELECT course_id, COUNT(*) FROM CourseStudents CS
+        WHERE CS.UCINetID IN ({placeholders})
+        AND NOT EXISTS (SELECT 1 FROM CoursePopularity CP WHERE CP.course_id = CS.course_id)
+        GROUP BY course_id;""", params)
+    cursor.execute("DELETE FROM CoursePopularity WHERE student_count <= 0;")
+#----------------------------------------------------- End of Course popularity aggregate --------------------------------------------------
+
+
+#----------------------------------------------------- Parallel import --------------------------------------------------
+# Parent tables of every table, read from the FOREIGN KEY ... REFERENCES clauses of the DDL
+def table_dependencies():
+    dependencies = {}
+    for table, query in CREATE_TABLE_QUERIES.items():
+        parents = set(re.findall(r"REFERENCES\s+(\w+)", query))
+        parents.discard(table)
+        dependencies[table] = parents
+    return dependencies
+
+
+# Group tables into waves: every table only depends on tables of earlier waves, so the
+# tables of one wave can be loaded at the same time. Parents outside `tables` are ignored.
+def dependency_waves(tables):
+    dependencies = table_dependencies()
+    remaining = {table: dependencies.get(table, set()) & set(tables) for table in tables}
+    waves = []
+    while remaining:
+        ready = [table for table in tables if table in remaining and not remaining[table]]
+        if not ready:
+            raise ValueError(f"Foreign keys form a cycle between {sorted(remaining)}")
+        waves.append(ready)
+        for table in ready:
+            del remaining[table]
+        for parents in remaining.values():
+            parents.difference_update(ready)
+    return waves
+
+
+# Load one table on the given connection, committing as the checkpoint settings require
+def load_table(connection, folder_name, table, checkpoint, checkpoint_path, strategy, batch_size, commit_every):
+    progress = checkpoint["tables"][table]
+    cursor = connection.cursor()
+
+    on_chunk = None
+    pending = {"offset": progress["offset"], "rows": 0}
+    if commit_every:
+        on_chunk = functools.partial(advance_checkpoint, connection, checkpoint_path, checkpoint, table, pending,
+                                     commit_every=commit_every)
+
+    file_path = os.path.join(folder_name, progress["file"])
+    stats = load_csv(cursor, table, file_path, strategy, batch_size, progress["offset"], on_chunk)
+
+    if commit_every:
+        commit_checkpoint(connection, checkpoint_path, checkpoint, table, pending, done=True)
+    else:
+        progress["done"] = True
+    cursor.close()
+    return stats
+
+
+# Load the tables wave by wave, each wave spread over a pool of `workers` connections.
+# Every worker connection commits its own tables, so this never runs as a single transaction.
+def load_tables_in_parallel(connection, folder_name, tables, checkpoint, checkpoint_path, strategy, batch_size, commit_every, workers, connect):
+    pool = queue.Queue()
+    pool.put(connection)
+    extra_connections = []
+    for _ in range(workers - 1):
+        worker_connection = connect()
+        worker_connection.cursor().execute("SET FOREIGN_KEY_CHECKS=0;")
+        extra_connections.append(worker_connection)
+        pool.put(worker_connection)
+
+    def run(table):
+        worker_connection = pool.get()
+        try:
+            stats = load_table(worker_connection, folder_name, table, checkpoint, checkpoint_path,
+                               strategy, batch_size, commit_every)
+            worker_connection.commit()
+            return stats
+        finally:
+            pool.put(worker_connection)
+
+    load_stats = []
+    try:
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for wave in dependency_waves(tables):
+                load_stats.extend(executor.map(run, wave))
+    finally:
+        for worker_connection in extra_connections:
+            worker_connection.close()
+    return load_stats
+#----------------------------------------------------- End of Parallel import --------------------------------------------------
+
+
+#----------------------------------------------------- Referential validation --------------------------------------------------
+# import loads with FOREIGN_KEY_CHECKS off, so before loading, every CSV row is checked against the keys of
+# its parent tables in memory. Tables are read in import order, parents first, collecting the referenced
+# key columns of the rows that passed into sets; a row whose reference is not in the set is rejected.
+# Rejected rows are listed with their reason in REJECTS_FILE in the import folder, and a table with
+# rejects is loaded from a copy of its file without them in VALIDATED_DIR; `import --incremental` diffs against that copy.
+# `import --no-validate` skips this.
+REJECTS_FILE = "import_rejects.csv"
+VALIDATED_DIR = ".import_validated"
+
+
+# (column position, parent table, parent column position) of every foreign key of a table
+def foreign_keys(table):
+    columns, _ = table_columns(table)
+    keys = []
+    for column, parent, parent_column in re.findall(r"FOREIGN KEY\((\w+)\) REFERENCES (\w+)\((\w+)\)", CREATE_TABLE_QUERIES[table]):
+        keys.append((columns.index(column), parent, table_columns(parent)[0].index(parent_column)))
+    return keys
+
+
+# A key the way the database compares char(n) keys: case-insensitively and without trailing spaces
+def reference_key(value):
+    return value.rstrip(" ").casefold()
+
+
+# Check the CSV files of `tables` against each other's keys. Returns {table: file to load instead} for
+# the tables that had rejected rows, relative to the folder, and the number of rejected rows.
+def validate_references(folder_name, tables):
+    references = {table: [key for key in foreign_keys(table) if key[1] in tables] for table in tables}
+    referenced = collections.defaultdict(set)  # table -> positions of its columns other tables reference
+    for keys in references.values():
+        for _, parent, parent_position in keys:
+            referenced[parent].add(parent_position)
+    parent_keys = collections.defaultdict(set)  # (table, position) -> keys of the rows that passed
+
+    rejects_path = os.path.join(folder_name, REJECTS_FILE)
+    replacements = {}
+    reject_count = 0
+    with open(rejects_path, 'w', newline='') as rejects_file:
+        rejects = csv.writer(rejects_file, lineterminator='\n')
+        rejects.writerow(["file", "line", "reason", "row"])
+        for table in tables:
+            file_name = csv_file_for(table)
+            columns, _ = table_columns(table)
+            rejected_rows = set()
+            with open(os.path.join(folder_name, file_name), 'r', newline='') as file:
+                reader = csv.reader(file)
+                for index, row in enumerate(row for row in reader if row):
+                    reasons = [f"{columns[position]} '{row[position]}' not found in {parent}"
+                               for position, parent, parent_position in references[table]
+                               if reference_key(row[position]) not in parent_keys[(parent, parent_position)]]
+                    if reasons:
+                        rejected_rows.add(index)
+                        rejects.writerow([file_name, reader.line_num, "; ".join(reasons), ",".join(row)])
+                        continue
+                    for position in referenced[table]:
+                        parent_keys[(table, position)].add(reference_key(row[position]))
+            if rejected_rows:
+                reject_count += len(rejected_rows)
+                replacements[table] = os.path.join(VALIDATED_DIR, file_name)
+                os.makedirs(os.path.join(folder_name, VALIDATED_DIR), exist_ok=True)
+                with open(os.path.join(folder_name, file_name), 'r', newline='') as file, \
+                        open(os.path.join(folder_name, replacements[table]), 'w', newline='') as cleaned:
+                    writer = csv.writer(cleaned, lineterminator='\n')
+                    writer.writerows(row for index, row in enumerate(row for row in csv.reader(file) if row)
+                                     if index not in rejected_rows)
+
+    if reject_count:
+        print(f"{reject_count} rows rejected by reference checks, see {rejects_path}", file=sys.stderr)
+    else:
+        os.remove(rejects_path)
+    return replacements, reject_count
+
+
+def remove_validated_files(folder_name):
+    validated_dir = os.path.join(folder_name, VALIDATED_DIR)
+    if os.path.isdir(validated_dir):
+        for file_name in os.listdir(validated_dir):
+            os.remove(os.path.join(validated_dir, file_name))
+        os.rmdir(validated_dir)
+#----------------------------------------------------- End of Referential validation --------------------------------------------------
+
+
+
+#----------------------------------------------------- Result cache --------------------------------------------------
+# Read-through cache for the query commands, keyed by command and parameters. Each entry remembers
+# the tables its query reads; a write invalidates exactly the entries that read a table it touched.
+# Entries are evicted least recently used first, when older than ttl seconds, or to stay under max_bytes.
+class ResultCache:
+    def __init__(self, max_entries=1024, ttl=300, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()  # key -> (output, result, tables, expires, size)
+        self.keys_by_table = collections.defaultdict(set)
+        self.generations = collections.defaultdict(int)  # bumped by every invalidation of a table
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[3] < time.monotonic():
+                self.remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def table_generations(self, tables):
+        with self.lock:
+            return tuple(self.generations[table] for table in tables)
+
+    # Store a result unless one of its tables was written while the query ran (generations changed)
+    def put(self, key, output, result, tables, generations):
+        size = sys.getsizeof(output) + result_size(result)
+        with self.lock:
+            if size > self.max_bytes or generations != tuple(self.generations[table] for table in tables):
+                return
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (output, result, tables, time.monotonic() + self.ttl, size)
+            self.bytes += size
+            for table in tables:
+                self.keys_by_table[table].add(key)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+
+    def invalidate(self, tables):
+        with self.lock:
+            for table in tables:
+                self.generations[table] += 1
+                for key in self.keys_by_table.pop(table, set()):
+                    if key in self.entries:
+                        self.remove(key)
+
+    # Callers hold the lock
+    def remove(self, key):
+        output, result, tables, expires, size = self.entries.pop(key)
+        self.bytes -= size
+        for table in tables:
+            self.keys_by_table[table].discard(key)
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries), "bytes": self.bytes}
+
+
+# Bytes held by a command's result: the list, its rows and the values inside them
+def result_size(result):
+    if not isinstance(result, list):
+        return 0
+    size = sys.getsizeof(result)
+    for row in result:
+        size += sys.getsizeof(row)
+        if isinstance(row, (tuple, list)):
+            size += sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+# The cache is off unless a long-lived mode (serve, batch) turns it on with --cache
+RESULT_CACHE = None
+
+
+def configure_cache(options):
+    global RESULT_CACHE
+    if "cache" in options:
+        RESULT_CACHE = ResultCache(int(options.get("cache-size", 1024)), float(options.get("cache-ttl", 300)),
+                                   int(float(options.get("cache-mb", 64)) * 1024 * 1024))
+
+
+# Tables invalidated on this thread are also collected in INVALIDATIONS.tables while it is a set,
+# so a WritePipeline can invalidate them again once its group is really committed
+INVALIDATIONS = threading.local()
+
+
+def invalidate_cache(*tables):
+    if RESULT_CACHE is not None:
+        RESULT_CACHE.invalidate(tables)
+        deferred = getattr(INVALIDATIONS, "tables", None)
+        if deferred is not None:
+            deferred.update(tables)
+
+
+# Decorator for the query commands: serve repeated calls from RESULT_CACHE by replaying the printed output.
+# `tables` lists every table the query reads. Failed queries (which return False) are never cached.
+def cached_query(*tables):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(connection, *args):
+            cache = RESULT_CACHE
+            if cache is None:
+                return function(connection, *args)
+            key = (function.__name__,) + tuple(str(arg) for arg in args)
+            entry = cache.get(key)
+            if entry is not None:
+                sys.stdout.write(entry[0])
+                return entry[1]
+            generations = cache.table_generations(tables)
+            output, result = capture_output(function, connection, *args)
+            sys.stdout.write(output)
+            if result is not False:
+                cache.put(key, output, result, tables, generations)
+            return result
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    if RESULT_CACHE is None:
+        print("Cache disabled")
+        return None
+    stats = RESULT_CACHE.stats()
+    print(",".join(f"{name}={value}" for name, value in stats.items()))
+    return stats
+#----------------------------------------------------- End of Result cache --------------------------------------------------
+
+
+
+# Count records in each table and print the counts
+def print_record_counts(cursor):
+    new_table_names = ['Users', 'Machines', 'Courses']
+    record_counts = []
+    for table in new_table_names:
+        cursor.execute(f"SELECT COUNT(*) FROM `{table}`;")
+        count = cursor.fetchone()[0]
+        record_counts.append(str(count))
+    print(",".join(record_counts))
+
+
 
 #-----------------------------------------------------------------------------------------------Function 1 : to import data from CSV files into the database ---------------------------------------------------------------------------------------------------------------
-def import_data(folder_name, connection):
+# commit_every turns on streaming mode: a commit (and checkpoint) every N rows instead of one transaction.
+# With resume=True an existing checkpoint in the folder is picked up and the load continues from it.
+# workers > 1 loads independent tables concurrently, opening the extra connections with connect().
+def import_data(folder_name, connection, strategy="batch", batch_size=1000, show_stats=False, commit_every=None, resume=False,
+                workers=1, connect=None, partition_by=None, validate=True):
 
     cursor = connection.cursor()
 
-    # List of table names derived from the provided CSV files
-    table_names = ['Admins', 'Courses', 'Emails', 'Machines', 'Projects', 'Students','StudentUse', 'Manage', 'Users']
+    if connect is None:
+        connect = lambda: create_database_connection(*DB_CONFIG)
 
-    #----------------------- drop tables that already exist in the database --------------------------------------------------
-    #To avoid foreign key constraint errors when dropping tables
-    # Define the order of table deletion, ensuring dependent tables are deleted first
-    tables_to_drop_in_order = [
-        'Had','StudentUse', 'Manage',
-        'Projects', 'Emails', 'Students', 'Admins',
-        'Machines', 'Courses', 'Users'
-    ]
+    # Fall back to what the backend can do: SQLite has no LOAD DATA and a single writer
+    if strategy == "infile" and not connection.backend.supports_infile:
+        strategy = "batch"
+    if not connection.backend.supports_parallel_load:
+        workers = 1
+    if not connection.backend.supports_partitioning:
+        partition_by = None
 
-    # Disable foreign key checks to facilitate table deletion
-    cursor.execute("SET FOREIGN_KEY_CHECKS=0;")
+    checkpoint_path = os.path.join(folder_name, CHECKPOINT_FILE)
+    checkpoint = read_checkpoint(checkpoint_path) if resume else None
 
-    # Delete tables in the defined order
-    for table in tables_to_drop_in_order:
-        cursor.execute(f"DROP TABLE IF EXISTS `{table}`;")
-        #print(f"Table `{table}` dropped successfully.")
+    if checkpoint is None:
+        #----------------------- drop tables that already exist in the database --------------------------------------------------
+        # Disable foreign key checks to facilitate table deletion
+        cursor.execute("SET FOREIGN_KEY_CHECKS=0;")
 
-    # Re-enable foreign key checks
-    cursor.execute("SET FOREIGN_KEY_CHECKS=1;")
+        # Delete tables in the defined order
+        for table in TABLES_TO_DROP_IN_ORDER:
+            cursor.execute(f"DROP TABLE IF EXISTS `{table}`;")
+            #print(f"Table `{table}` dropped successfully.")
 
-    #------------------------------------------------End of drop tables that already exist in the database --------------------------------------------------
-    
-    
-    
-    #----------------------- ------------------------Create new tables based on DDLs --------------------------------------------------
-    create_table_queries = {
-        'Users': """CREATE TABLE IF NOT EXISTS Users (UCINetID char(50) NOT NULL, FirstName varchar(50), MiddleName varchar(50), LastName varchar(50), PRIMARY KEY(UCINetID));""",
-        'Emails': """CREATE TABLE IF NOT EXISTS Emails (UCINetID char(50), email_address varchar(50), PRIMARY KEY(UCINetID, email_address), FOREIGN KEY(UCINetID) REFERENCES Users(UCINetID) ON DELETE CASCADE);""",
-        'Students': """CREATE TABLE IF NOT EXISTS Students (UCINetID char(50) NOT NULL, PRIMARY KEY(UCINetID), FOREIGN KEY(UCINetID) REFERENCES Users(UCINetID));""",
-        'Admins': """CREATE TABLE IF NOT EXISTS Admins (admin_UCINetID char(50) NOT NULL, PRIMARY KEY(admin_UCINetID), FOREIGN KEY(admin_UCINetID) REFERENCES Users(UCINetID));""",
-        'Courses': """CREATE TABLE IF NOT EXISTS Courses (course_id char(50) NOT NULL, title varchar(255), quarter varchar(20), PRIMARY KEY(course_id));""",
-        'Projects': """CREATE TABLE IF NOT EXISTS Projects (project_id char(50) NOT NULL, project_name varchar(100), project_description TEXT, course_id char(50) NOT NULL,  PRIMARY KEY(project_id), FOREIGN KEY(course_id) REFERENCES Courses(course_id));""",
-        'Machines': """CREATE TABLE IF NOT EXISTS Machines (machine_id char(50) NOT NULL, hostname varchar(255), IP_address varchar(15), operational_status varchar(50), location varchar(255), PRIMARY KEY(machine_id));""",
-        'Had': """CREATE TABLE IF NOT EXISTS Had(project_id char(50), course_id char(50), PRIMARY KEY(project_id), FOREIGN KEY(project_id) REFERENCES Projects(project_id), FOREIGN KEY(course_id) REFERENCES Courses(course_id)); """,
-        'StudentUse': """CREATE TABLE IF NOT EXISTS StudentUse (project_id char(50), UCINetID char(50), machine_id char(50), start_date date, end_date date, PRIMARY KEY(UCINetID, project_id, machine_id), FOREIGN KEY(UCINetID) REFERENCES Users(UCINetID), FOREIGN KEY(project_id) REFERENCES Projects(project_id), FOREIGN KEY(machine_id) REFERENCES Machines(machine_id));""",
-        'Manage': """CREATE TABLE IF NOT EXISTS Manage (admin_UCINetID char(50), machine_id char(50), PRIMARY KEY(admin_UCINetID, machine_id), FOREIGN KEY(admin_UCINetID) REFERENCES Admins(admin_UCINetID), FOREIGN KEY(machine_id) REFERENCES Machines(machine_id));"""
-    }
-
-    for table, query in create_table_queries.items():
-        cursor.execute(query)
-        #print(f"Table `{table}` created successfully.")
+        # Re-enable foreign key checks
+        cursor.execute("SET FOREIGN_KEY_CHECKS=1;")
+
+        #------------------------------------------------End of drop tables that already exist in the database --------------------------------------------------
+
+
+
+        #----------------------- ------------------------Create new tables based on DDLs --------------------------------------------------
+        for table, query in CREATE_TABLE_QUERIES.items():
+            if table == 'StudentUse' and partition_by:
+                query = partitioned_student_use_query(folder_name, partition_by)
+            cursor.execute(query)
+            #print(f"Table `{table}` created successfully.")
+
+        #-----------------------------------------------------END of Creating new tables based on DDLs -----------------------------------------------------------
 
-    #-----------------------------------------------------END of Creating new tables based on DDLs -----------------------------------------------------------
+        checkpoint = {"tables": {}}
+        for table in IMPORT_TABLES_IN_ORDER:
+            checkpoint["tables"][table] = {"file": csv_file_for(table), "offset": 0, "rows": 0, "done": False}
+
+        # Tables with rows referencing missing parents load from a copy without them
+        if validate:
+            remove_validated_files(folder_name)
+            replacements, _ = validate_references(folder_name, IMPORT_TABLES_IN_ORDER)
+            for table, file_name in replacements.items():
+                checkpoint["tables"][table]["file"] = file_name
     
     
     
     #----------------------------------------------------- Insert data for each table --------------------------------------------------
-    # First, process the CSV file for the 'users' table
-
-    with open(os.path.join(folder_name, 'users.csv'), 'r') as file:
-        csv_reader = csv.reader(file)
-        for row in csv_reader:
-            insert_query = "INSERT INTO Users VALUES (%s, %s, %s, %s);"
-            cursor.execute(insert_query, tuple(row))
-        #print("Data inserted into Users table successfully.")
+    load_stats = []
 
-    # Specify the tables and their corresponding CSV files to be processed in order
-    ordered_tables = ['Admins', 'Students', 'Emails', 'Courses', 'Projects', 'Machines', 'StudentUse','Manage']
-    
     #Disable foreign key checks
     cursor.execute("SET FOREIGN_KEY_CHECKS=0;")
     
-    # Process the remaining CSV files in the specified order
-    for table in ordered_tables:
-        name = table 
-        if table=="StudentUse":
-            name = "use"
-        with open(os.path.join(folder_name, f'{name.lower()}.csv'), 'r') as file:
-            csv_reader = csv.reader(file)
-            for row in csv_reader:
-                # Dynamically construct the INSERT INTO statement based on the structure of the CSV file
-                column_count = len(row)
-                insert_query = f"INSERT INTO `{table}` VALUES ({', '.join(['%s'] * column_count)});"
-                cursor.execute(insert_query, tuple(row))
-            #print(f"Data inserted into {table.capitalize()} table successfully.")
+    # Process the CSV files in the specified order, skipping tables a resumed checkpoint already finished
+    tables = [table for table in IMPORT_TABLES_IN_ORDER if not checkpoint["tables"][table]["done"]]
+    if workers > 1:
+        load_stats = load_tables_in_parallel(connection, folder_name, tables, checkpoint, checkpoint_path,
+                                             strategy, batch_size, commit_every, workers, connect)
+    else:
+        for table in tables:
+            load_stats.append(load_table(connection, folder_name, table, checkpoint, checkpoint_path,
+                                         strategy, batch_size, commit_every))
     #----------------------------------------------------- End oF Insert data for each table --------------------------------------------------
+
+    # Build the secondary indexes in one pass now that the data is in place
+    create_secondary_indexes(cursor)
+
+    # Fill the popularCourse aggregate from the loaded StudentUse rows
+    rebuild_course_popularity(cursor)
     
     # Re-enable foreign key checks
     cursor.execute("SET FOREIGN_KEY_CHECKS=1;")
     
-    # Count records in each table and print the counts
-    new_table_names = ['Users', 'Machines', 'Courses']
-    record_counts = []
-    for table in new_table_names:
-        cursor.execute(f"SELECT COUNT(*) FROM `{table}`;")
-        count = cursor.fetchone()[0]
-        record_counts.append(str(count))
-    print(",".join(record_counts))
+    # Remember what was loaded so a later incremental import can skip unchanged files
+    record_fingerprints(cursor, {table: file_fingerprint(os.path.join(folder_name, csv_file_for(table)))
+                                 for table in IMPORT_TABLES_IN_ORDER})
+
+    print_record_counts(cursor)
+
+    # Per-table load rates go to stderr so the counts above stay the only stdout output
+    if show_stats:
+        for table, rows, elapsed in load_stats:
+            rate = rows / elapsed if elapsed > 0 else float(rows)
+            print(f"{table}: {rows} rows in {elapsed:.3f}s ({rate:.0f} rows/sec, {strategy})", file=sys.stderr)
 
     connection.commit()
+    invalidate_cache(*CREATE_TABLE_QUERIES)
     cursor.close()
+
+    # The import finished, so there is nothing left to resume
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    remove_validated_files(folder_name)
+    return load_stats
 #-----------------------------------------------------------------------------------------------End of Function 1 to import data from CSV files into the database ---------------------------------------------------------------------------------------------------------------
 
 
+
+#----------------------------------------------------- Incremental import --------------------------------------------------
+# `import <folder> --incremental` compares every CSV file with the fingerprint recorded by the previous
+# import and leaves unchanged tables alone. For a changed file it diffs the rows against the table on
+# the primary key from CREATE_TABLE_QUERIES and applies only the inserts, updates and deletes.
+
+# Column names and primary key columns of a table, read from its DDL
+def table_columns(table, query=None):
+    query = query or CREATE_TABLE_QUERIES[table]
+    body = query[query.index("(") + 1:query.rindex(")")]
+    definitions = re.split(r",\s*(?![^()]*\))", body)
+    columns = []
+    primary_key = []
+    for definition in definitions:
+        definition = definition.strip()
+        if definition.upper().startswith("PRIMARY KEY"):
+            primary_key = [column.strip() for column in definition[definition.index("(") + 1:definition.index(")")].split(",")]
+        elif not definition.upper().startswith("FOREIGN KEY"):
+            columns.append(definition.split()[0])
+    return columns, primary_key
+
+
+# (size, mtime, sha256) of a file
+def file_fingerprint(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime, digest.hexdigest()
+
+
+def read_fingerprints(cursor):
+    cursor.execute("SELECT file_name, file_size, mtime, content_hash FROM ImportFingerprints;")
+    return {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+
+
+def record_fingerprints(cursor, fingerprints):
+    for table, (size, mtime, content_hash) in fingerprints.items():
+        cursor.execute("DELETE FROM ImportFingerprints WHERE file_name = %s;", (csv_file_for(table),))
+        cursor.execute("INSERT INTO ImportFingerprints (file_name, file_size, mtime, content_hash) VALUES (%s, %s, %s, %s);",
+                       (csv_file_for(table), size, mtime, content_hash))
+
+
+# Rows of the CSV file missing from the table, differing from it, and table rows missing from the file.
+# The file is held in memory keyed by primary key while the table is streamed past it.
+def compute_table_delta(cursor, table, file_path, definition=None):
+    columns, primary_key = definition or table_columns(table)
+    key_positions = [columns.index(column) for column in primary_key]
+
+    file_rows = {}
+    for rows, _ in iter_csv_chunks(file_path):
+        for row in rows:
+            file_rows[tuple(row[position] for position in key_positions)] = tuple(row)
+
+    updates = []
+    deletes = []
+    cursor.execute(f"SELECT {', '.join(columns)} FROM `{table}`;")
+    for row in cursor.fetchall():
+        # Compare the way the values were loaded: dates as YYYY-MM-DD and SQL NULL as NULL
+        current = tuple("NULL" if value is None else str(value) for value in row)
+        key = tuple(current[position] for position in key_positions)
+        wanted = file_rows.pop(key, None)
+        if wanted is None:
+            deletes.append(key)
+        elif wanted != current:
+            updates.append(wanted)
+    return list(file_rows.values()), updates, deletes
+
+
+# Period of the partitioned StudentUse an earlier `import --partition-by` built, read from its partition names,
+# or None when StudentUse is not partitioned
+def student_use_partitioning(cursor):
+    if not cursor.backend.supports_partitioning:
+        return None
+    cursor.execute("""SELECT PARTITION_NAME FROM information_schema.partitions
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'StudentUse' AND PARTITION_NAME IS NOT NULL;""")
+    names = [row[0] for row in cursor.fetchall()]
+    if not names:
+        return None
+    for period, pattern in (('month', r"p\d{4}m\d{2}"), ('quarter', r"p\d{4}q\d"), ('year', r"p\d{4}")):
+        if any(re.fullmatch(pattern, name) for name in names):
+            return period
+    return 'year'  # only the catch-all partition, which every period builds for a use.csv without dates
+
+
+# An incremental import keeps the StudentUse layout of the database: a partitioned StudentUse is diffed on
+# the partitioned primary key, which includes start_date. Changing the layout takes a full import.
+def import_delta(folder_name, connection, batch_size=1000, show_stats=False, validate=True, partition_by=None):
+    if not connection.backend.supports_partitioning:
+        partition_by = None
+    cursor = connection.cursor()
+    layout = student_use_partitioning(cursor)
+    try:
+        previous = read_fingerprints(cursor)
+    except Error:
+        # Nothing was imported with fingerprints yet, so fall back to a full import
+        cursor.close()
+        return import_data(folder_name, connection, batch_size=batch_size, show_stats=show_stats,
+                           partition_by=partition_by or layout, validate=validate)
+    if partition_by and partition_by != layout:
+        print("Fail")
+        print(f"import --incremental keeps the current StudentUse layout, run a full import to partition it by {partition_by}")
+        cursor.close()
+        return False
+    definitions = {table: table_columns(table) for table in IMPORT_TABLES_IN_ORDER}
+    if layout:
+        definitions['StudentUse'] = table_columns('StudentUse', PARTITIONED_STUDENT_USE_QUERY.split("PARTITION BY")[0].rstrip())
+
+    fingerprints = {}
+    changed = []
+    for table in IMPORT_TABLES_IN_ORDER:
+        file_path = os.path.join(folder_name, csv_file_for(table))
+        stat = os.stat(file_path)
+        old = previous.get(csv_file_for(table))
+        if old is not None and old[0] == stat.st_size and old[1] == stat.st_mtime:
+            continue
+        fingerprints[table] = file_fingerprint(file_path)
+        if old is None or old[2] != fingerprints[table][2]:
+            changed.append(table)
+
+    # Diff against the files without the rows validate_references rejects, the same files a full import loads.
+    # A changed table can add or remove the parents of rows in the tables under it, so those are diffed too.
+    replacements = {}
+    if validate and changed:
+        remove_validated_files(folder_name)
+        replacements, _ = validate_references(folder_name, IMPORT_TABLES_IN_ORDER)
+        for table in IMPORT_TABLES_IN_ORDER:
+            if table not in changed and any(parent in changed for _, parent, _ in foreign_keys(table)):
+                changed.append(table)
+        changed.sort(key=IMPORT_TABLES_IN_ORDER.index)
+
+    cursor.execute("SET FOREIGN_KEY_CHECKS=0;")
+    deltas = {table: compute_table_delta(cursor, table, os.path.join(folder_name, replacements.get(table, csv_file_for(table))),
+                                         definitions[table])
+              for table in changed}
+    remove_validated_files(folder_name)
+
+    # Deletes run children first, inserts and updates parents first
+    for table in reversed(changed):
+        columns, primary_key = definitions[table]
+        condition = " AND ".join(f"{column} = %s" for column in primary_key)
+        deletes = deltas[table][2]
+        for start in range(0, len(deletes), batch_size):
+            cursor.executemany(f"DELETE FROM `{table}` WHERE {condition};", deletes[start:start + batch_size])
+
+    for table in changed:
+        columns, primary_key = definitions[table]
+        inserts, updates, _ = deltas[table]
+        insert_query = f"INSERT INTO `{table}` ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))});"
+        for start in range(0, len(inserts), batch_size):
+            cursor.executemany(insert_query, inserts[start:start + batch_size])
+
+        value_columns = [column for column in columns if column not in primary_key]
+        if value_columns and updates:
+            key_positions = [columns.index(column) for column in primary_key]
+            value_positions = [columns.index(column) for column in value_columns]
+            update_query = (f"UPDATE `{table}` SET {', '.join(f'{column} = %s' for column in value_columns)} "
+                            f"WHERE {' AND '.join(f'{column} = %s' for column in primary_key)};")
+            params = [tuple(row[position] for position in value_positions + key_positions) for row in updates]
+            for start in range(0, len(params), batch_size):
+                cursor.executemany(update_query, params[start:start + batch_size])
+
+    cursor.execute("SET FOREIGN_KEY_CHECKS=1;")
+
+    if 'StudentUse' in changed or 'Projects' in changed:
+        rebuild_course_popularity(cursor)
+    record_fingerprints(cursor, fingerprints)
+    print_record_counts(cursor)
+
+    if show_stats:
+        for table in IMPORT_TABLES_IN_ORDER:
+            if table in deltas:
+                inserts, updates, deletes = deltas[table]
+                print(f"{table}: {len(inserts)} inserted, {len(updates)} updated, {len(deletes)} deleted", file=sys.stderr)
+            else:
+                print(f"{table}: unchanged", file=sys.stderr)
+
+    connection.commit()
+    invalidate_cache(*changed, 'CourseStudents', 'CoursePopularity')
+    cursor.close()
+    return deltas
+#----------------------------------------------------- End of Incremental import --------------------------------------------------
+
+
+#----------------------------------------------------- Snapshots --------------------------------------------------
+# `snapshot <name>` saves the loaded database under SNAPSHOT_DIR/<name> and `restore <name>` puts it back,
+# so resetting to known data does not re-run the import. SQLite snapshots are copies of the database
+# file made with the online backup API. MySQL snapshots keep the CREATE TABLE statement of every table
+# and its rows in LOAD DATA's default format (tab separated, backslash escapes, \N for NULL), restored
+# with LOAD DATA LOCAL INFILE or with batched INSERTs when the server refuses local files.
+# snapshot.json records the hash of the CSV files the data was imported from, which `restore --folder` checks.
+SNAPSHOT_DIR = ".snapshots"
+
+
+# Hash of the content of a folder's CSV files, as recorded for the loaded data in ImportFingerprints
+def source_hash(content_hashes):
+    digest = hashlib.sha256()
+    for table in IMPORT_TABLES_IN_ORDER:
+        digest.update(f"{csv_file_for(table)}:{content_hashes.get(csv_file_for(table))}\n".encode())
+    return digest.hexdigest()
+
+
+def folder_source_hash(folder_name):
+    return source_hash({csv_file_for(table): file_fingerprint(os.path.join(folder_name, csv_file_for(table)))[2]
+                        for table in IMPORT_TABLES_IN_ORDER})
+
+
+def snapshot_path(name):
+    return os.path.join(SNAPSHOT_DIR, name)
+
+
+def read_snapshot_info(name):
+    try:
+        with open(os.path.join(snapshot_path(name), "snapshot.json"), 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def escape_dump_field(value):
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def unescape_dump_field(field):
+    if field == "\\N":
+        return None
+    return re.sub(r"\\(.)", lambda match: {"t": "\t", "n": "\n"}.get(match.group(1), match.group(1)), field)
+
+
+def dump_table(connection, table, file_path, batch_size=1000):
+    row_count = 0
+    with open(file_path, 'w', newline='') as file:
+        for rows in stream_rows(connection, f"SELECT * FROM `{table}`;", None, batch_size):
+            file.write("".join("\t".join(escape_dump_field(value) for value in row) + "\n" for row in rows))
+            row_count += len(rows)
+    return row_count
+
+
+def load_dump(cursor, table, file_path, batch_size=1000):
+    if cursor.backend.supports_infile:
+        try:
+            cursor.execute(f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table}`;", (os.path.abspath(file_path),))
+            return
+        except Error:
+            pass  # local_infile is disabled on the server, insert the rows instead
+    with open(file_path, 'r', newline='') as file:
+        rows = []
+        for line in file:
+            rows.append(tuple(unescape_dump_field(field) for field in line.rstrip("\n").split("\t")))
+            if len(rows) == batch_size:
+                cursor.executemany(f"INSERT INTO `{table}` VALUES ({', '.join(['%s'] * len(rows[0]))});", rows)
+                rows = []
+        if rows:
+            cursor.executemany(f"INSERT INTO `{table}` VALUES ({', '.join(['%s'] * len(rows[0]))});", rows)
+
+
+def take_snapshot(connection, name, import_options=None):
+    cursor = connection.cursor()
+    try:
+        try:
+            content_hash = source_hash({file_name: fingerprint[2]
+                                        for file_name, fingerprint in read_fingerprints(cursor).items()})
+        except Error:
+            content_hash = None  # not loaded by import
+        folder = snapshot_path(name)
+        os.makedirs(folder, exist_ok=True)
+        info = {"name": name, "backend": connection.backend.name, "source_hash": content_hash,
+                "import_options": import_options, "created": datetime.now().isoformat(timespec="seconds"), "tables": {}}
+        if connection.backend.supports_backup:
+            import sqlite3
+            connection.commit()
+            target = sqlite3.connect(os.path.join(folder, "database.sqlite"))
+            try:
+                connection.raw_connection.backup(target)
+            finally:
+                target.close()
+        else:
+            info["ddl"] = {}
+            for table in CREATE_TABLE_QUERIES:
+                cursor.execute(f"SHOW CREATE TABLE `{table}`;")
+                info["ddl"][table] = cursor.fetchone()[1]
+                info["tables"][table] = dump_table(connection, table, os.path.join(folder, f"{table}.tsv"))
+        with open(os.path.join(folder, "snapshot.json"), 'w') as file:
+            json.dump(info, file, indent=2)
+        return True
+    except (Error, OSError) as e:
+        print(f"The error '{e}' occurred")
+        return False
+    finally:
+        cursor.close()
+
+
+def restore_snapshot(connection, name):
+    info = read_snapshot_info(name)
+    if info is None or info["backend"] != connection.backend.name:
+        print(f"No {connection.backend.name} snapshot named '{name}'")
+        return False
+    folder = snapshot_path(name)
+    cursor = connection.cursor()
+    try:
+        if connection.backend.supports_backup:
+            import sqlite3
+            connection.commit()
+            source = sqlite3.connect(os.path.join(folder, "database.sqlite"))
+            try:
+                source.backup(connection.raw_connection)
+            finally:
+                source.close()
+        else:
+            cursor.execute("SET FOREIGN_KEY_CHECKS=0;")
+            for table in TABLES_TO_DROP_IN_ORDER:
+                cursor.execute(f"DROP TABLE IF EXISTS `{table}`;")
+            for table, ddl in info["ddl"].items():
+                cursor.execute(ddl)
+                load_dump(cursor, table, os.path.join(folder, f"{table}.tsv"))
+            cursor.execute("SET FOREIGN_KEY_CHECKS=1;")
+            connection.commit()
+        invalidate_cache(*CREATE_TABLE_QUERIES)
+        return True
+    except (Error, OSError) as e:
+        print(f"The error '{e}' occurred")
+        connection.rollback()
+        return False
+    finally:
+        cursor.close()
+
+
+# import <folder> --snapshot: restore the snapshot an earlier `import --snapshot` took of these exact
+# files with the same layout options, or import them and take it. The snapshot is named after the hash
+# of the files and of the options that change what gets loaded; snapshot.json records the options too.
+def import_with_snapshot(folder_name, connection, **import_options):
+    layout = {"partition_by": import_options.get("partition_by"), "validate": import_options.get("validate", True)}
+    digest = hashlib.sha256(f"{folder_source_hash(folder_name)}:{json.dumps(layout, sort_keys=True)}".encode())
+    name = f"import-{digest.hexdigest()[:16]}"
+    info = read_snapshot_info(name)
+    if (info is not None and info["backend"] == connection.backend.name and info.get("import_options") == layout
+            and restore_snapshot(connection, name)):
+        cursor = connection.cursor()
+        print_record_counts(cursor)
+        cursor.close()
+        return True
+    import_data(folder_name, connection, **import_options)
+    return take_snapshot(connection, name, layout)
+#----------------------------------------------------- End of Snapshots --------------------------------------------------
+
+
 # ----------------------------------------------------------------------------------------------Function 2 :to insert a new student into the database -------------------------------------------------------------------------------------------------------------------------------------#
 def insert_student(connection, UCINetID, email, first, middle, last):
     cursor = connection.cursor()
@@ -156,6 +1527,7 @@ def insert_student(connection, UCINetID, email, first, middle, last):
         cursor.execute(email_insert_query, (UCINetID, email))
 
         connection.commit()  # Commit the transaction
+        invalidate_cache('Users', 'Students', 'Emails')
         print("Success")
     except Error as e:
         #print(f"The error '{e}' occurred")
@@ -180,6 +1552,7 @@ def add_email(connection, UCINetID, email):
         cursor.execute(email_insert_query, (UCINetID, email))
 
         connection.commit()  # Commit the transaction
+        invalidate_cache('Emails')
         print("Success")
     except Error as e:
         print(f"The error '{e}' occurred")
@@ -201,10 +1574,15 @@ def delete_student(connection, UCINetID):
         # Execute delete operation in Student table first to maintain referential integrity.
         cursor.execute(delete_student_query, (UCINetID,))
         cursor.execute(delete_user_query, (UCINetID,))
+        deleted = cursor.rowcount
+
+        # Keep the course popularity aggregate in line with the StudentUse rows that remain
+        refresh_course_students(cursor, [UCINetID])
         
         connection.commit()
-        print("Success" if cursor.rowcount > 0 else "Fail")
-    except mysql.connector.Error as err:
+        invalidate_cache('Students', 'Users', 'Emails', 'CourseStudents', 'CoursePopularity')
+        print("Success" if deleted > 0 else "Fail")
+    except Error as err:
         print("Fail")
         print(err)
         success = False
@@ -222,8 +1600,9 @@ def insert_machine(connection, machine_id, hostname, ip_addr, status, location):
         machine_insert_query = """INSERT INTO Machines (machine_id, hostname, IP_address, operational_status, location) VALUES (%s, %s, %s, %s, %s)"""
         cursor.execute(machine_insert_query, (machine_id, hostname, ip_addr, status, location))
         connection.commit()
+        invalidate_cache('Machines')
         print("Success" if cursor.rowcount > 0 else "Fail")
-    except mysql.connector.Error as err:
+    except Error as err:
         print("Fail")
         print(err)
         success = False
@@ -240,9 +1619,12 @@ def insert_use(connection, proj_id, ucinetid, machine_id, start_date, end_date):
     try:
         query = """INSERT INTO StudentUse (project_id, UCINetID, machine_id, start_date, end_date) VALUES (%s, %s, %s, %s, %s)"""
         cursor.execute(query, (proj_id, ucinetid, machine_id, start_date, end_date))
+        inserted = cursor.rowcount
+        add_course_use(cursor, proj_id, ucinetid)
         connection.commit()
-        print("Success" if cursor.rowcount > 0 else "Fail")
-    except mysql.connector.Error as err:
+        invalidate_cache('StudentUse', 'CourseStudents', 'CoursePopularity')
+        print("Success" if inserted > 0 else "Fail")
+    except Error as err:
         print("Fail")
         print(err)
         success = False
@@ -266,6 +1648,7 @@ def updateCourse(connection, courseID, title):
         cursor.execute(title_update_query, (title, courseID))
 
         connection.commit()  # Commit the transaction
+        invalidate_cache('Courses')
         print("Success")
     except Error as e:
         print("Fail")
@@ -283,25 +1666,26 @@ def updateCourse(connection, courseID, title):
 
 #--------------------------------------------------------------------------------------- Function 8 :listCourse  ----------------------------------------------------------------------------------------------------------------------------------------------------#
 
-def listCourse(connection, UCINetID):
-    cursor = connection.cursor()
-    
-    try:
-        list_course_query = """
+LIST_COURSE_QUERY = """
         SELECT DISTINCT C.course_id, C.title, C.quarter
         FROM Courses C, StudentUse U, Projects P
         WHERE U.project_id = P.project_id 
         AND P.course_id = C.course_id 
-        AND U.UCINetID = '{0}'
+        AND U.UCINetID = %s
         ORDER BY C.course_id ASC; 
-        """.format(UCINetID)
+        """
+
+@cached_query('Courses', 'StudentUse', 'Projects')
+def listCourse(connection, UCINetID):
+    cursor = connection.cursor()
+    
+    try:
 
         # Execute the query
         #print("Trying...")
         #print(cursor)
         #print('coonection: ', connection)
-        #print(list_course_query)
-        cursor.execute(list_course_query)
+        cursor.execute(LIST_COURSE_QUERY, (UCINetID,))
         #print("Tried...")
         # Fetch the results
         results = cursor.fetchall()
@@ -327,24 +1711,33 @@ def listCourse(connection, UCINetID):
 
 #--------------------------------------------------------------------------------------- Function 9 :popularCourse  ----------------------------------------------------------------------------------------------------------------------------------------------------#
 
-def popularCourse(connection, num):
-    cursor = connection.cursor()
-
-    try:
+# Top-N read over the maintained CoursePopularity aggregate
+POPULAR_COURSE_QUERY = """
+        SELECT C.course_id, C.title, CP.student_count AS studentCount
+        FROM CoursePopularity CP
+        JOIN Courses C ON C.course_id = CP.course_id
+        ORDER BY CP.student_count DESC, CP.course_id DESC
+        LIMIT %s;
+        """
 
-        course_query1 = """
-        SELECT C.course_id, C.title, COUNT(DISTINCT U.UCINetID) AS studentCount
+# The full recomputation the aggregate replaces, used by verify
+COURSE_POPULARITY_RECOMPUTE_QUERY = """
+        SELECT C.course_id, COUNT(DISTINCT U.UCINetID) AS studentCount
         FROM Courses C 
         JOIN Projects P ON C.course_id = P.course_id
         JOIN StudentUse U ON P.project_id = U.project_id
-        GROUP BY C.course_id, C.title
-        ORDER BY studentCount DESC, C.course_id DESC
-        LIMIT %s;
+        GROUP BY C.course_id
         """ 
 
+@cached_query('Courses', 'CoursePopularity')
+def popularCourse(connection, num):
+    cursor = connection.cursor()
+
+    try:
+
         # Execute the query
         #print("Number: ", num, type(num)) 
-        cursor.execute(course_query1, (int(num), ))
+        cursor.execute(POPULAR_COURSE_QUERY, (int(num), ))
 
         # Fetch the results
         results = list(cursor.fetchall()) 
@@ -366,15 +1759,42 @@ def popularCourse(connection, num):
         cursor.close()
 
 
+
+# Check the CoursePopularity aggregate against the full recomputation.
+# Prints Success, or one course_id,expected,maintained line per mismatch followed by Fail.
+def verify_course_popularity(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(COURSE_POPULARITY_RECOMPUTE_QUERY)
+        expected = {course_id: count for course_id, count in cursor.fetchall()}
+        cursor.execute("""SELECT CP.course_id, CP.student_count FROM CoursePopularity CP
+            JOIN Courses C ON C.course_id = CP.course_id;""")
+        maintained = {course_id: count for course_id, count in cursor.fetchall()}
+
+        mismatches = []
+        for course_id in sorted(set(expected) | set(maintained)):
+            if expected.get(course_id, 0) != maintained.get(course_id, 0):
+                mismatches.append(f"{course_id},{expected.get(course_id, 0)},{maintained.get(course_id, 0)}")
+        if mismatches:
+            print("\n".join(mismatches))
+            print("Fail")
+            return False
+        print("Success")
+        return True
+
+    except Exception as e:
+        print(f"The error '{e}' occurred")
+        return False
+
+    finally:
+        cursor.close()
+
 #--------------------------------------------------------------------------------------- END of Function 9 ----------------------------------------------------------------------------------------------------------------------------------------------------#
 
 
 
 #Given a machine ID, find all administrators of that machine. List the emails of those administrators. Ordered by netid ascending.
-def adminEmail(connection, machineId):
-    cursor = connection.cursor()
-    try:
-        adminEmail_query = """
+ADMIN_EMAIL_QUERY = """
        SELECT AD.admin_UCINetID, U.FirstName, U.MiddleName, U.LastName, GROUP_CONCAT(UE.email_address SEPARATOR ';') AS email_addresses
         FROM Admins AD
         JOIN Users U ON AD.admin_UCINetID = U.UCINetID
@@ -388,7 +1808,12 @@ def adminEmail(connection, machineId):
         GROUP BY AD.admin_UCINetID
         ORDER BY AD.admin_UCINetID ASC;
         """
-        cursor.execute(adminEmail_query, (machineId,))
+
+@cached_query('Admins', 'Users', 'Emails', 'Manage')
+def adminEmail(connection, machineId):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(ADMIN_EMAIL_QUERY, (machineId,))
         rows = cursor.fetchall()
         result = []
         for row in rows:
@@ -409,12 +1834,7 @@ def adminEmail(connection, machineId):
 #--------------------------------------------------------------------------------------- END of Function 10 ----------------------------------------------------------------------------------------------------------------------------------------------------#
 
 
-from datetime import datetime
-
-def activeStudents(connection, machineid, start_date, end_date, N):
-    cursor = connection.cursor()
-    try:
-        activeStudents_query = """
+ACTIVE_STUDENTS_QUERY = """
             SELECT U.UCINetID, U.FirstName, U.MiddleName, U.LastName
             FROM Users U
             JOIN Students S ON U.UCINetID = S.UCINetID
@@ -423,12 +1843,40 @@ def activeStudents(connection, machineid, start_date, end_date, N):
             WHERE StudentUse.machine_id = %s
             AND StudentUse.start_date >= %s
             AND StudentUse.end_date <= %s
+            AND StudentUse.start_date <= %s
             AND M.operational_status = 'Active'
             GROUP BY U.UCINetID
             HAVING COUNT(*) >= %s
             ORDER BY U.UCINetID ASC;
         """
-        cursor.execute(activeStudents_query, (machineid, start_date, end_date, N,))
+# start_date <= end of the window follows from end_date <= end of the window for any use that ends after
+# it starts. It bounds the start_date range on both sides, so only the partitions of the window are read.
+
+# --overlap: uses that were running at any point of the window, not only the ones inside it.
+# Bounded by end_date from below (idx_studentuse_machine_end) and by start_date from above (partitions).
+ACTIVE_STUDENTS_OVERLAP_QUERY = """
+            SELECT U.UCINetID, U.FirstName, U.MiddleName, U.LastName
+            FROM Users U
+            JOIN Students S ON U.UCINetID = S.UCINetID
+            JOIN StudentUse ON U.UCINetID = StudentUse.UCINetID
+            JOIN Machines M ON StudentUse.machine_id = M.machine_id
+            WHERE StudentUse.machine_id = %s
+            AND StudentUse.end_date >= %s
+            AND StudentUse.start_date <= %s
+            AND M.operational_status = 'Active'
+            GROUP BY U.UCINetID
+            HAVING COUNT(*) >= %s
+            ORDER BY U.UCINetID ASC;
+        """
+
+@cached_query('Users', 'Students', 'StudentUse', 'Machines')
+def activeStudents(connection, machineid, start_date, end_date, N, overlap=False):
+    cursor = connection.cursor()
+    try:
+        if overlap:
+            cursor.execute(ACTIVE_STUDENTS_OVERLAP_QUERY, (machineid, start_date, end_date, int(N),))
+        else:
+            cursor.execute(ACTIVE_STUDENTS_QUERY, (machineid, start_date, end_date, end_date, int(N),))
         rows = cursor.fetchall()
         result = "\n".join([",".join(map(str, row[:4])) for row in rows])
         print(result)
@@ -447,11 +1895,7 @@ def activeStudents(connection, machineid, start_date, end_date, N):
 
 #--------------------------------------------------------------------------------------- END of Function 11 ----------------------------------------------------------------------------------------------------------------------------------------------------#
 
-def numMachineUsage(connection, courseId):
-    cursor = connection.cursor()
-    try:
-
-        numMachineUsage_query1 = """
+MACHINE_USAGE_QUERY = """
             SELECT 
     M.machine_id,
     M.hostname,
@@ -475,7 +1919,12 @@ LEFT JOIN (
 ORDER BY 
     M.machine_id DESC;
 """
-        cursor.execute(numMachineUsage_query1, (courseId,))
+
+@cached_query('Machines', 'StudentUse', 'Projects')
+def numMachineUsage(connection, courseId):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(MACHINE_USAGE_QUERY, (courseId,))
         rows = cursor.fetchall()
         result = "\n".join([",".join(map(str, row[:4])) for row in rows])
         print(result)
@@ -489,120 +1938,1334 @@ ORDER BY
 
 #--------------------------------------------------------------------------------------- END of Function 12 ----------------------------------------------------------------------------------------------------------------------------------------------------#
 
-# Main function to parse command-line arguments and call the appropriate function
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 project.py <function name> [parameters]")
+#--------------------------------------------------------------------------------------- Multi-key queries ----------------------------------------------------------------------------------------------------------------------------------------------------#
+# listCourses / adminEmailsMulti / machineUsageMatrix answer listCourse / adminEmails / machineUsage for
+# many IDs with one grouped query instead of one query per ID. Every output line starts with the ID it
+# belongs to. Long ID lists are sent in chunks of MULTI_KEY_CHUNK_SIZE to keep the IN lists bounded.
+MULTI_KEY_CHUNK_SIZE = 500
+
+LIST_COURSES_QUERY = """
+        SELECT DISTINCT U.UCINetID, C.course_id, C.title, C.quarter
+        FROM StudentUse U
+        JOIN Projects P ON U.project_id = P.project_id
+        JOIN Courses C ON P.course_id = C.course_id
+        WHERE U.UCINetID IN ({keys})
+        ORDER BY U.UCINetID ASC, C.course_id ASC;
+        """
+
+ADMIN_EMAILS_MULTI_QUERY = """
+        SELECT AMM.machine_id, AD.admin_UCINetID, U.FirstName, U.MiddleName, U.LastName,
+               GROUP_CONCAT(UE.email_address SEPARATOR ';') AS email_addresses
+        FROM Manage AMM
+        JOIN Admins AD ON AMM.admin_UCINetID = AD.admin_UCINetID
+        JOIN Users U ON AD.admin_UCINetID = U.UCINetID
+        JOIN Emails UE ON AD.admin_UCINetID = UE.UCINetID
+        WHERE AMM.machine_id IN ({keys})
+        GROUP BY AMM.machine_id, AD.admin_UCINetID
+        ORDER BY AMM.machine_id ASC, AD.admin_UCINetID ASC;
+        """
+
+# Every course against every machine, with the use counts of all courses computed in one grouped scan
+MACHINE_USAGE_MATRIX_QUERY = """
+        SELECT C.course_id, M.machine_id, M.hostname, M.IP_address, IFNULL(X.usage_count, 0) AS count
+        FROM Courses C
+        CROSS JOIN Machines M
+        LEFT JOIN (
+            SELECT P.course_id, U.machine_id, COUNT(*) AS usage_count
+            FROM StudentUse U
+            JOIN Projects P ON U.project_id = P.project_id
+            GROUP BY P.course_id, U.machine_id
+        ) X ON X.course_id = C.course_id AND X.machine_id = M.machine_id
+        {where}
+        ORDER BY C.course_id ASC, M.machine_id DESC;
+        """
+
+
+# IDs from the command line followed by the first column of every line of an optional file, without repeats
+def collect_ids(args, file_name=None):
+    ids = list(args)
+    if file_name:
+        with open(file_name, 'r') as file:
+            ids.extend(row[0].strip() for row in csv.reader(file) if row and row[0].strip())
+    return list(dict.fromkeys(ids))
+
+
+# Run query once per chunk of ids, with {keys} replaced by the placeholders of the chunk. The ids are
+# deduplicated and sorted the way the database compares keys first, so chunks of a query ordered by
+# the id come back in order and the rows are sorted overall.
+def fetch_by_keys(cursor, query, ids, chunk_size=MULTI_KEY_CHUNK_SIZE):
+    ids = sorted({reference_key(key): key for key in reversed(ids)}.values(), key=reference_key)
+    rows = []
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        cursor.execute(query.format(keys=", ".join(["%s"] * len(chunk))), tuple(chunk))
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+@cached_query('Courses', 'StudentUse', 'Projects')
+def listCourses(connection, ucinetids):
+    cursor = connection.cursor()
+    try:
+        rows = fetch_by_keys(cursor, LIST_COURSES_QUERY, list(ucinetids))
+        print("\n".join(",".join(map(str, row)) for row in rows))
+        return rows
+    except Exception as e:
+        print(f"The error '{e}' occurred")
+        return False
+    finally:
+        cursor.close()
+
+
+@cached_query('Admins', 'Users', 'Emails', 'Manage')
+def adminEmailsMulti(connection, machine_ids):
+    cursor = connection.cursor()
+    try:
+        rows = fetch_by_keys(cursor, ADMIN_EMAILS_MULTI_QUERY, list(machine_ids))
+        print("\n".join(",".join(map(str, row[:5])) + "," + row[5] for row in rows))
+        return rows
+    except Exception as e:
+        print(f"The error '{e}' occurred")
+        return False
+    finally:
+        cursor.close()
+
+
+# All courses, or only course_ids when given
+@cached_query('Courses', 'Machines', 'StudentUse', 'Projects')
+def machineUsageMatrix(connection, course_ids=()):
+    cursor = connection.cursor()
+    try:
+        if course_ids:
+            rows = fetch_by_keys(cursor, MACHINE_USAGE_MATRIX_QUERY.replace("{where}", "WHERE C.course_id IN ({keys})"),
+                                 list(course_ids))
+        else:
+            cursor.execute(MACHINE_USAGE_MATRIX_QUERY.format(where=""))
+            rows = cursor.fetchall()
+        print("\n".join(",".join(map(str, row)) for row in rows))
+        return rows
+    except Exception as e:
+        print(f"The error '{e}' occurred")
+        return False
+    finally:
+        cursor.close()
+
+#--------------------------------------------------------------------------------------- End of Multi-key queries ----------------------------------------------------------------------------------------------------------------------------------------------------#
+
+#--------------------------------------------------------------------------------------- Machine timeline ----------------------------------------------------------------------------------------------------------------------------------------------------#
+# machineTimeline reads the (machine_id, start_date, end_date) intervals of StudentUse in one pass and
+# counts how many uses were running on every machine on every day with a sweep line over NumPy arrays:
+# +1 on the start day and -1 on the day after the end, scattered with bincount and summed with cumsum.
+# A use counts on every day from its start_date to its end_date inclusive. NumPy is optional and only
+# imported by this command.
+MACHINE_INTERVALS_QUERY = """
+        SELECT machine_id, start_date, end_date
+        FROM StudentUse
+        WHERE start_date IS NOT NULL AND end_date IS NOT NULL
+        AND end_date >= start_date {where};
+        """
+
+
+# Daily concurrency of machine_count machines from first to last (numpy datetime64[D]).
+# rows, starts and ends are arrays with one entry per use; rows holds the machine's row (-1 for a machine
+# that isn't reported). Returns a machines x days int array.
+def sweep_line_concurrency(np, machine_count, rows, starts, ends, first, last):
+    day_count = int((last - first).astype(np.int64)) + 1
+    inside = (rows >= 0) & (ends >= first) & (starts <= last)
+    rows = rows[inside]
+    start_days = (np.maximum(starts[inside], first) - first).astype(np.int64)
+    end_days = (np.minimum(ends[inside], last) - first).astype(np.int64) + 1
+    width = day_count + 1
+    size = machine_count * width
+    deltas = (np.bincount(rows * width + start_days, minlength=size)
+              - np.bincount(rows * width + end_days, minlength=size))
+    return np.cumsum(deltas.reshape(machine_count, width), axis=1)[:, :day_count]
+
+
+# Prints machine_id,date,concurrency for every machine and day, or with summary=True one
+# machine_id,peak,peak_date,busy_days,idle_days line per machine. Machines default to all of them,
+# the days to the range covered by the uses.
+@cached_query('Machines', 'StudentUse')
+def machineTimeline(connection, machine_ids=(), start_date=None, end_date=None, summary=False):
+    try:
+        import numpy as np
+    except ImportError:
+        print("Fail")
+        print("machineTimeline needs NumPy (pip install numpy)")
+        return False
+
+    cursor = connection.cursor()
+    try:
+        if machine_ids:
+            machines = sorted(set(machine_ids))
+        else:
+            cursor.execute("SELECT machine_id FROM Machines ORDER BY machine_id ASC;")
+            machines = sorted(str(row[0]) for row in cursor.fetchall())
+        where, params = "", []
+        if start_date:
+            where, params = where + " AND end_date >= %s", params + [start_date]
+        if end_date:
+            where, params = where + " AND start_date <= %s", params + [end_date]
+
+        # Requested machines are filtered in SQL, in chunks of MULTI_KEY_CHUNK_SIZE like fetch_by_keys
+        queries = [(MACHINE_INTERVALS_QUERY.format(where=where), tuple(params))]
+        if machine_ids:
+            queries = [(MACHINE_INTERVALS_QUERY.format(where=where + " AND machine_id IN (" + ", ".join(["%s"] * len(chunk)) + ")"),
+                        tuple(params) + tuple(chunk))
+                       for chunk in (machines[i:i + MULTI_KEY_CHUNK_SIZE] for i in range(0, len(machines), MULTI_KEY_CHUNK_SIZE))]
+
+        machine_rows = {machine_id: row for row, machine_id in enumerate(machines)}
+        use_rows, starts, ends = [], [], []
+        for query, query_params in queries:
+            for rows in stream_rows(connection, query, query_params):
+                for machine_id, start, end in rows:
+                    use_rows.append(machine_rows.get(str(machine_id), -1))
+                    starts.append(start)
+                    ends.append(end)
+        starts = np.array(starts, dtype='datetime64[D]')
+        ends = np.array(ends, dtype='datetime64[D]')
+        if not machines or (not len(starts) and not (start_date and end_date)):
+            print("")
+            return []
+        first = np.datetime64(start_date, 'D') if start_date else starts.min()
+        last = np.datetime64(end_date, 'D') if end_date else ends.max()
+        if last < first:
+            print("")
+            return []
+
+        concurrency = sweep_line_concurrency(np, len(machines), np.array(use_rows, dtype=np.int64),
+                                             starts, ends, first, last)
+        dates = np.arange(first, last + 1).astype(str)
+
+        lines = []
+        if summary:
+            for machine_id, counts in zip(machines, concurrency):
+                peak_day = int(counts.argmax())
+                busy_days = int(np.count_nonzero(counts))
+                lines.append(f"{machine_id},{counts[peak_day]},{dates[peak_day]},{busy_days},{len(counts) - busy_days}")
+        else:
+            for machine_id, counts in zip(machines, concurrency):
+                lines.extend(f"{machine_id},{day},{count}" for day, count in zip(dates, counts.tolist()))
+        print("\n".join(lines))
+        return lines
+
+    except Exception as e:
+        print(f"The error '{e}' occurred")
+        return False
+    finally:
+        cursor.close()
+
+#--------------------------------------------------------------------------------------- End of Machine timeline ----------------------------------------------------------------------------------------------------------------------------------------------------#
+
+#--------------------------------------------------------------------------------------- Function 13 : explain  ----------------------------------------------------------------------------------------------------------------------------------------------------#
+# Query commands that can be explained: the SQL they run and how their command-line arguments become query parameters
+QUERY_COMMANDS = {
+    'listCourse': (LIST_COURSE_QUERY, 1, lambda args: (args[0],)),
+    'popularCourse': (POPULAR_COURSE_QUERY, 1, lambda args: (int(args[0]),)),
+    'adminEmails': (ADMIN_EMAIL_QUERY, 1, lambda args: (args[0],)),
+    'activeStudent': (ACTIVE_STUDENTS_QUERY, 4, lambda args: (args[0], args[2], args[3], args[3], int(args[1]))),
+    'activeStudentOverlap': (ACTIVE_STUDENTS_OVERLAP_QUERY, 4, lambda args: (args[0], args[2], args[3], int(args[1]))),
+    'machineUsage': (MACHINE_USAGE_QUERY, 1, lambda args: (args[0],)),
+}
+
+# Print the plan the database uses for one query command, one plan row per line under a header of column names
+def explain(connection, command, args):
+    cursor = connection.cursor()
+    try:
+        query, _, make_params = QUERY_COMMANDS[command]
+        cursor.execute("EXPLAIN " + query.strip(), make_params(args))
+        rows = cursor.fetchall()
+        plan = [",".join(column[0] for column in cursor.description)]
+        plan.extend(",".join(map(str, row)) for row in rows)
+        print("\n".join(plan))
+        return rows
+    except Exception as e:
+        print(f"The error '{e}' occurred")
+        return False
+    finally:
+        cursor.close()
+
+#--------------------------------------------------------------------------------------- END of Function 13 ----------------------------------------------------------------------------------------------------------------------------------------------------#
+
+#--------------------------------------------------------------------------------------- Streaming output ----------------------------------------------------------------------------------------------------------------------------------------------------#
+# With --stream (or --output=file) a query command reads its result through an unbuffered cursor in
+# batches of STREAM_BATCH_SIZE rows and writes every batch out as soon as it arrives, instead of
+# fetchall() plus one big join. Memory stays flat and the first rows show up before the query finishes.
+STREAM_BATCH_SIZE = 1000
+
+
+# Yield the result of a query batch by batch. A `columns` list gets the result's column names once the query has run.
+def stream_rows(connection, query, params, batch_size=STREAM_BATCH_SIZE, columns=None):
+    cursor = connection.cursor()
+    finished = False
+    try:
+        cursor.execute(query, params)
+        if columns is not None:
+            columns.extend(column[0] for column in cursor.description)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                finished = True
+                return
+            yield rows
+    finally:
+        # An unbuffered result has to be read to the end before the connection can run another statement
+        if not finished:
+            try:
+                while cursor.fetchmany(batch_size):
+                    pass
+            except Error:
+                pass
+        cursor.close()
+
+
+def format_row(row):
+    return ",".join(map(str, row[:4]))
+
+
+def format_admin_row(row):
+    return ",".join(map(str, row[:4])) + "," + row[4]
+
+
+# Same line format as the buffered commands print
+ROW_FORMATTERS = {
+    'listCourse': lambda row: ",".join(str(col) for col in row),
+    'popularCourse': lambda row: ",".join(str(col) for col in row),
+    'adminEmails': format_admin_row,
+    'activeStudent': format_row,
+    'activeStudentOverlap': format_row,
+    'machineUsage': format_row,
+}
+
+
+def stream_query_command(connection, command, args, out, batch_size=STREAM_BATCH_SIZE):
+    query, _, make_params = QUERY_COMMANDS[command]
+    format_line = ROW_FORMATTERS[command]
+    row_count = 0
+    try:
+        for rows in stream_rows(connection, query, make_params(args), batch_size):
+            out.write("".join(format_line(row) + "\n" for row in rows))
+            out.flush()
+            row_count += len(rows)
+        if row_count == 0:
+            # The buffered commands print an empty line for an empty result
+            out.write("\n")
+        return row_count
+    except Exception as e:
+        print(f"The error '{e}' occurred")
+        return False
+#--------------------------------------------------------------------------------------- End of Streaming output ----------------------------------------------------------------------------------------------------------------------------------------------------#
+
+#--------------------------------------------------------------------------------------- Columnar export ----------------------------------------------------------------------------------------------------------------------------------------------------#
+# export writes a table, or the result of a query command, to a typed columnar file that analytics
+# jobs can memory-map instead of querying the database and parsing the text output:
+#   parquet - Parquet file, one row group per batch (needs pyarrow)
+#   arrow   - Arrow IPC file, memory-mappable with pyarrow.memory_map (needs pyarrow)
+#   npy     - folder with one <column>.npy per column for np.load(mmap_mode='r') (needs only NumPy)
+# Rows are read through stream_rows, so memory stays bounded by the batch size whatever the result size.
+EXPORT_FORMATS = ['parquet', 'arrow', 'npy']
+
+
+def export_format_for(path):
+    return {'.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}.get(os.path.splitext(path)[1].lower(), 'npy')
+
+
+# (query, params) of a table or of a query command with its parameters, None when it is neither
+def export_source(source, args):
+    if source in CREATE_TABLE_QUERIES and not args:
+        return f"SELECT * FROM `{source}`;", None
+    if source in QUERY_COMMANDS and len(args) == QUERY_COMMANDS[source][1]:
+        query, _, make_params = QUERY_COMMANDS[source]
+        return query, make_params(args)
+    return None
+
+
+def write_arrow_file(batches, columns, path, file_format):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    def open_writer(schema):
+        return pq.ParquetWriter(path, schema) if file_format == 'parquet' else pa.ipc.new_file(path, schema)
+
+    writer = None
+    schema = None
+    row_count = 0
+    try:
+        for rows in batches:
+            values = list(zip(*rows))
+            if writer is None:
+                # Types come from the first batch; a column that is all NULL there is stored as text
+                types = [pa.array(column).type for column in values]
+                schema = pa.schema([(name, pa.string() if pa.types.is_null(type_) else type_)
+                                    for name, type_ in zip(columns, types)])
+                writer = open_writer(schema)
+            table = pa.table([pa.array(column, type=field.type) for column, field in zip(values, schema)], schema=schema)
+            writer.write_table(table)
+            row_count += len(rows)
+        if writer is None:
+            writer = open_writer(pa.schema([(name, pa.string()) for name in columns]))
+    finally:
+        if writer is not None:
+            writer.close()
+    return row_count
+
+
+# NumPy kind of a column from its first non-NULL value: i(nt), f(loat), D(ate), T(imestamp) or s(tring)
+def column_kind(values):
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, (bool, int)):
+            return 'i'
+        if isinstance(value, float) or type(value).__name__ == 'Decimal':
+            return 'f'
+        if isinstance(value, datetime):
+            return 'T'
+        if hasattr(value, 'isoformat'):
+            return 'D'
+        return 's'
+    return None
+
+
+def column_array(np, kind, values):
+    if kind == 'i' and None in values:
+        return np.array([np.nan if value is None else value for value in values], dtype='float64')
+    if kind == 'i':
+        return np.array(values, dtype='int64')
+    if kind == 'f':
+        return np.array([np.nan if value is None else float(value) for value in values], dtype='float64')
+    if kind in ('D', 'T'):
+        return np.array(values, dtype='datetime64[D]' if kind == 'D' else 'datetime64[us]')
+    return np.array(['' if value is None else str(value) for value in values], dtype=str)
+
+
+# One .npy per column. Batches are spooled to a temporary file first, because the final dtype (string
+# width, integers with NULLs becoming float) and the row count are only known after the last batch.
+def write_npy_columns(batches, columns, folder):
+    import numpy as np
+    import tempfile
+
+    kinds = None
+    final = None
+    batch_sizes = []
+    with tempfile.TemporaryFile() as spool:
+        for rows in batches:
+            values = list(zip(*rows))
+            if kinds is None:
+                kinds = [None] * len(columns)
+                final = [None] * len(columns)
+            for index, column in enumerate(values):
+                kinds[index] = kinds[index] or column_kind(column)
+                array = column_array(np, kinds[index], column)
+                final[index] = array.dtype if final[index] is None else np.promote_types(final[index], array.dtype)
+                np.save(spool, array, allow_pickle=False)
+            batch_sizes.append(len(rows))
+
+        os.makedirs(folder, exist_ok=True)
+        row_count = sum(batch_sizes)
+        outputs = [np.lib.format.open_memmap(os.path.join(folder, re.sub(r'[^\w.-]', '_', name) + ".npy"), mode='w+',
+                                             dtype=final[index] if final else 'U1', shape=(row_count,))
+                   for index, name in enumerate(columns)]
+        spool.seek(0)
+        offset = 0
+        for size in batch_sizes:
+            for output in outputs:
+                output[offset:offset + size] = np.load(spool, allow_pickle=False)
+            offset += size
+        for output in outputs:
+            output.flush()
+    return row_count
+
+
+def export(connection, source, args, output, file_format=None, batch_size=STREAM_BATCH_SIZE):
+    query, params = export_source(source, args)
+    file_format = file_format or export_format_for(output)
+    columns = []
+    batches = stream_rows(connection, query, params, batch_size, columns)
+    try:
+        if file_format == 'npy':
+            row_count = write_npy_columns(batches, columns, output)
+        else:
+            row_count = write_arrow_file(batches, columns, output, file_format)
+        print("Success")
+        return row_count
+    except ImportError as e:
+        print("Fail")
+        print(f"export --format={file_format} needs {e.name} (pip install {e.name}), or use --format=npy")
+        return False
+    except Exception as e:
+        print("Fail")
+        print(f"The error '{e}' occurred")
+        return False
+    finally:
+        batches.close()
+#--------------------------------------------------------------------------------------- End of Columnar export ----------------------------------------------------------------------------------------------------------------------------------------------------#
+
+#--------------------------------------------------------------------------------------- Bulk mutation commands ----------------------------------------------------------------------------------------------------------------------------------------------------#
+# insertStudents / addEmails / insertUses take a CSV file with the parameters of insertStudent /
+# addEmail / insertUse, one record per line. Every row is validated before anything is written,
+# valid rows are written with multi-row INSERTs, transaction_size rows per transaction. When a batch
+# is rejected by the database its rows are retried one by one, so each row gets its own result.
+# The report has one line per CSV row: line,Success or line,Fail,reason.
+
+def is_date(value):
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+
+def check_user_email_row(row):
+    if not row[0] or not row[1]:
+        return "UCINetID and email are required"
+    return None
+
+
+def check_use_row(row):
+    if not all(row[:3]):
+        return "ProjId, UCINetID and MachineID are required"
+    if not is_date(row[3]) or not is_date(row[4]):
+        return "dates must be YYYY-MM-DD"
+    if row[3] > row[4]:
+        return "start date is after end date"
+    return None
+
+
+# Per command: column count, row check, primary key of the row, the INSERTs every row turns into, tables written
+BULK_COMMANDS = {
+    'insertStudents': (5, check_user_email_row, lambda row: row[0], [
+        ("INSERT INTO Users (UCINetID, FirstName, MiddleName, LastName) VALUES (%s, %s, %s, %s);", lambda row: (row[0], row[2], row[3], row[4])),
+        ("INSERT INTO Students (UCINetID) VALUES (%s);", lambda row: (row[0],)),
+        ("INSERT INTO Emails (UCINetID, email_address) VALUES (%s, %s);", lambda row: (row[0], row[1])),
+    ], ('Users', 'Students', 'Emails')),
+    'addEmails': (2, check_user_email_row, lambda row: (row[0], row[1]), [
+        ("INSERT INTO Emails (UCINetID, email_address) VALUES (%s, %s);", lambda row: (row[0], row[1])),
+    ], ('Emails',)),
+    'insertUses': (5, check_use_row, lambda row: (row[1], row[0], row[2]), [
+        ("INSERT INTO StudentUse (project_id, UCINetID, machine_id, start_date, end_date) VALUES (%s, %s, %s, %s, %s);", lambda row: tuple(row)),
+    ], ('StudentUse', 'CourseStudents', 'CoursePopularity')),
+}
+
+
+# Validate all rows of a bulk file, returns ([(line, row), ...] to write, {line: reason} of rejected rows)
+def validate_bulk_rows(file_path, column_count, check_row, row_key):
+    valid = []
+    rejected = {}
+    seen = set()
+    with open(file_path, 'r') as file:
+        for line, row in enumerate(csv.reader(file), start=1):
+            if not row:
+                continue
+            row = [value.strip() for value in row]
+            if len(row) != column_count:
+                rejected[line] = f"expected {column_count} columns, got {len(row)}"
+                continue
+            reason = check_row(row)
+            if reason is None and row_key(row) in seen:
+                reason = "duplicate of an earlier row"
+            if reason is not None:
+                rejected[line] = reason
+                continue
+            seen.add(row_key(row))
+            valid.append((line, row))
+    return valid, rejected
+
+
+# Write one batch with one multi-row INSERT per statement; on error undo the batch and write its rows one at a time
+def write_bulk_batch(cursor, batch, statements, results):
+    cursor.execute("SAVEPOINT bulk_batch;")
+    try:
+        for query, make_params in statements:
+            cursor.executemany(query, [make_params(row) for _, row in batch])
+        for line, _ in batch:
+            results[line] = None
+        return
+    except Error:
+        cursor.execute("ROLLBACK TO SAVEPOINT bulk_batch;")
+
+    for line, row in batch:
+        cursor.execute("SAVEPOINT bulk_row;")
+        try:
+            for query, make_params in statements:
+                cursor.execute(query, make_params(row))
+            results[line] = None
+        except Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT bulk_row;")
+            results[line] = str(e)
+
+
+def bulk_insert(connection, command, file_path, transaction_size=None, batch_size=1000):
+    column_count, check_row, row_key, statements, tables = BULK_COMMANDS[command]
+    valid, results = validate_bulk_rows(file_path, column_count, check_row, row_key)
+
+    cursor = connection.cursor()
+    transaction_size = transaction_size or max(len(valid), 1)
+    committed = 0  # rows of valid in committed transactions
+    success = True
+    try:
+        for start in range(0, len(valid), transaction_size):
+            transaction_rows = valid[start:start + transaction_size]
+            for batch_start in range(0, len(transaction_rows), batch_size):
+                write_bulk_batch(cursor, transaction_rows[batch_start:batch_start + batch_size], statements, results)
+            if command == 'insertUses':
+                # Bring the popularCourse aggregate up to date for the students of this transaction
+                written = {row[1] for line, row in transaction_rows if results[line] is None}
+                if written:
+                    refresh_course_students(cursor, sorted(written))
+            connection.commit()
+            committed = start + len(transaction_rows)
+            invalidate_cache(*tables)
+    except Error as e:
+        connection.rollback()
+        success = False
+        # Earlier transactions stay committed; the rows of the failed one and of the ones after it were not written
+        for line, _ in valid[committed:]:
+            if results.get(line) is None:
+                results[line] = f"not committed: {e}"
+    cursor.close()
+
+    report = []
+    for line in sorted(results):
+        report.append(f"{line},Success" if results[line] is None else f"{line},Fail,{results[line]}")
+    print("\n".join(report))
+    return results if success else False
+#--------------------------------------------------------------------------------------- End of Bulk mutation commands ----------------------------------------------------------------------------------------------------------------------------------------------------#
+
+#--------------------------------------------------------------------------------------- Bulk delete ----------------------------------------------------------------------------------------------------------------------------------------------------#
+# deleteStudents removes many students at once: the listed UCINetIDs, the students with no use ending on
+# or after --inactive-since, or the listed ones among those when both are given. It works through them
+# DELETE_BATCH_SIZE students per transaction so no batch holds StudentUse locks for long. Each batch
+# deletes the students' StudentUse rows, keeps the course popularity aggregate in line, then deletes their
+# Emails, Students and Users rows. A student who is also an admin keeps the Users row and the emails.
+# Prints table,rows deleted for each table.
+DELETE_BATCH_SIZE = 500
+
+INACTIVE_STUDENTS_QUERY = """
+        SELECT S.UCINetID
+        FROM Students S
+        WHERE NOT EXISTS (
+            SELECT 1 FROM StudentUse U
+            WHERE U.UCINetID = S.UCINetID AND U.end_date >= %s
+        )
+        ORDER BY S.UCINetID ASC;
+        """
+
+
+def delete_students(connection, ucinetids=None, inactive_since=None, batch_size=DELETE_BATCH_SIZE):
+    cursor = connection.cursor()
+    counts = collections.OrderedDict((table, 0) for table in ['StudentUse', 'Emails', 'Students', 'Users'])
+    success = True
+    try:
+        if inactive_since:
+            cursor.execute(INACTIVE_STUDENTS_QUERY, (inactive_since,))
+            students = [row[0] for row in cursor.fetchall()]
+            if ucinetids is not None:
+                wanted = set(ucinetids)
+                students = [ucinetid for ucinetid in students if ucinetid in wanted]
+        else:
+            students = [row[0] for row in fetch_by_keys(cursor, "SELECT UCINetID FROM Students WHERE UCINetID IN ({keys});",
+                                                         list(ucinetids))]
+
+        for start in range(0, len(students), batch_size):
+            batch = students[start:start + batch_size]
+            keys = ", ".join(["%s"] * len(batch))
+            params = tuple(batch)
+            not_admin = "AND UCINetID NOT IN (SELECT admin_UCINetID FROM Admins)"
+            cursor.execute(f"DELETE FROM StudentUse WHERE UCINetID IN ({keys});", params)
+            counts['StudentUse'] += cursor.rowcount
+            refresh_course_students(cursor, batch)
+            cursor.execute(f"DELETE FROM Emails WHERE UCINetID IN ({keys}) {not_admin};", params)
+            counts['Emails'] += cursor.rowcount
+            cursor.execute(f"DELETE FROM Students WHERE UCINetID IN ({keys});", params)
+            counts['Students'] += cursor.rowcount
+            cursor.execute(f"DELETE FROM Users WHERE UCINetID IN ({keys}) {not_admin};", params)
+            counts['Users'] += cursor.rowcount
+            connection.commit()
+            invalidate_cache('StudentUse', 'Emails', 'Students', 'Users', 'CourseStudents', 'CoursePopularity')
+    except Error as err:
+        print("Fail")
+        print(err)
+        success = False
+        connection.rollback()
+
+    cursor.close()
+    # Batches committed before a failure stay deleted, so the counts are printed either way
+    print("\n".join(f"{table},{count}" for table, count in counts.items()))
+    return counts if success else False
+#--------------------------------------------------------------------------------------- End of Bulk delete ----------------------------------------------------------------------------------------------------------------------------------------------------#
+
+
+# Run one command given in the argv layout of the command line (argv[0] is the program name)
+def run_command(connection, argv):
+    # activeStudent ... --overlap runs (and explains or streams) the activeStudentOverlap query
+    if "--overlap" in argv and "activeStudent" in argv[1:3]:
+        argv = [arg for arg in argv if arg != "--overlap"]
+        argv[argv.index("activeStudent", 1)] = "activeStudentOverlap"
+    command = argv[1]
+
+    stream_args, stream_options = parse_flags(argv[2:])
+    if command in QUERY_COMMANDS and ("stream" in stream_options or "output" in stream_options):
+        if len(stream_args) != QUERY_COMMANDS[command][1]:
+            print(f"Usage: python3 project.py {command} [parameters] --stream [--output=file] [--batch-size=N]")
+        elif "output" in stream_options:
+            with open(stream_options["output"], 'w') as out:
+                stream_query_command(connection, command, stream_args, out, int(stream_options.get("batch-size", STREAM_BATCH_SIZE)))
+        else:
+            stream_query_command(connection, command, stream_args, sys.stdout, int(stream_options.get("batch-size", STREAM_BATCH_SIZE)))
         return
-    
-    command = sys.argv[1]
-    #test, password
-    connection = create_database_connection("localhost", 'test', 'password', "cs122a")  # Remember Update with our own credentials
 
     if command == "import":
-        if len(sys.argv) != 3:
-            print("Usage: python3 project.py import [folderName]")
+        args, options = parse_flags(argv[2:])
+        strategy = options.get("strategy", "batch")
+        partition_by = options.get("partition-by")
+        if len(args) != 1 or strategy not in LOAD_STRATEGIES or partition_by not in PARTITION_PERIODS + [None]:
+            print("Usage: python3 project.py import [folderName] [--strategy=row|batch|infile] [--batch-size=N] [--stats] [--commit-every=N] [--resume] [--workers=N] [--incremental] [--partition-by=month|quarter|year] [--snapshot] [--no-validate]")
+        elif "incremental" in options:
+            import_delta(args[0], connection, int(options.get("batch-size", 1000)), "stats" in options,
+                         validate="no-validate" not in options, partition_by=partition_by)
+        elif "snapshot" in options:
+            import_with_snapshot(args[0], connection, strategy=strategy, batch_size=int(options.get("batch-size", 1000)),
+                                 show_stats="stats" in options, workers=int(options.get("workers", 1)),
+                                 partition_by=partition_by, validate="no-validate" not in options)
         else:
-            folder_name = sys.argv[2]
-            import_data(folder_name, connection)
+            folder_name = args[0]
+            batch_size = int(options.get("batch-size", 1000))
+            # --resume implies streaming mode, a plain streaming import can be resumed later
+            commit_every = int(options.get("commit-every", 10000 if "resume" in options else 0)) or None
+            workers = int(options.get("workers", 1))
+            import_data(folder_name, connection, strategy, batch_size, "stats" in options, commit_every, "resume" in options, workers,
+                        partition_by=partition_by, validate="no-validate" not in options)
     elif command == "insertStudent":
-        if len(sys.argv) != 7:
+        if len(argv) != 7:
             print("Usage: python3 project.py insertStudent [UCINetID] [email] [First] [Middle] [Last]")
         else:
-            UCINetID = sys.argv[2]
-            email = sys.argv[3]
-            first = sys.argv[4]
-            middle = sys.argv[5]
-            last = sys.argv[6]
+            UCINetID = argv[2]
+            email = argv[3]
+            first = argv[4]
+            middle = argv[5]
+            last = argv[6]
             success = insert_student(connection, UCINetID, email, first, middle, last)
             if not success:
                 print("Fail")
     elif command == "addEmail":
-        if len(sys.argv) != 4:
+        if len(argv) != 4:
             print("Usage: python3 project.py addEmail [UCINetID] [email]")
         else:
-            UCINetID = sys.argv[2]
-            email = sys.argv[3]
+            UCINetID = argv[2]
+            email = argv[3]
             success = add_email(connection, UCINetID, email)
             if not success:
                 print("Fail")
     elif command == "deleteStudent":
-        if len(sys.argv) != 3:
+        if len(argv) != 3:
             print("Usage: python3 project.py deleteStudent [UCINetID]")
         else:
-            UCINetID = sys.argv[2]
+            UCINetID = argv[2]
             delete_student(connection, UCINetID)
     elif command == "insertMachine":
-        if len(sys.argv) != 7:
+        if len(argv) != 7:
             print("Usage: python3 project.py insertMachine [MachineID] [hostname] [IPAddr] [status] [location]")
         else:
-            machine_id = sys.argv[2]
-            hostname = sys.argv[3]
-            ip_addr = sys.argv[4]
-            status = sys.argv[5]
-            location = sys.argv[6]
+            machine_id = argv[2]
+            hostname = argv[3]
+            ip_addr = argv[4]
+            status = argv[5]
+            location = argv[6]
             insert_machine(connection, machine_id, hostname, ip_addr, status, location)
     elif command == "insertUse":
-        if len(sys.argv) != 7:
+        if len(argv) != 7:
             print("Usage: python3 project.py insertUse [ProjId] [UCINetID] [MachineID] [start] [end]")
         else:
-            proj_id = sys.argv[2]
-            ucinetid = sys.argv[3]
-            machine_id = sys.argv[4]
-            start_date = sys.argv[5]
-            end_date = sys.argv[6]
+            proj_id = argv[2]
+            ucinetid = argv[3]
+            machine_id = argv[4]
+            start_date = argv[5]
+            end_date = argv[6]
             insert_use(connection, proj_id, ucinetid, machine_id, start_date, end_date)
 
  # Rishika - func 7, 8, 9 
     elif command == "updateCourse":
-        if len(sys.argv) != 4:
+        if len(argv) != 4:
             print("Usage: python3 project.py updateCourse [CourseId:int] [title:str]")
         else:
-            course_id = sys.argv[2]
-            title = sys.argv[3]
+            course_id = argv[2]
+            title = argv[3]
             success = updateCourse(connection, course_id, title)
             if not success:
                 print("Fail")
 
     elif command == "listCourse":
-        if len(sys.argv) != 3:
+        if len(argv) != 3:
             print("Usage: python3 project.py listCourse [UCINetID]")
         else:
-            ucinetid = sys.argv[2]
+            ucinetid = argv[2]
             listCourse(connection, ucinetid)
 
     elif command == "popularCourse":
-        if len(sys.argv) != 3:
+        if len(argv) != 3:
             print("Usage: python3 project.py popularCourse [N]")
         else:
-            num = sys.argv[2]
+            num = argv[2]
             popularCourse(connection, num)
     elif command =='adminEmails':
-        if len(sys.argv) != 3:
+        if len(argv) != 3:
             print("Usage: python3 project.py adminEmails [machineId]")
         else:
-            machine_id = sys.argv[2]
+            machine_id = argv[2]
             adminEmail(connection, machine_id)
     
-    elif command =='activeStudent':
-        if len(sys.argv) != 6:
-            print("Usage: python3 project.py activeStudent [machineId:int] [N:int] [start_date:Date] [end:Date]")
-        else:
-            machine_id = sys.argv[2]
-            num = sys.argv[3]
-            start_date = sys.argv[4]
-            end_date = sys.argv[5]
-            activeStudents(connection, machine_id, start_date, end_date, num)
+    elif command in ('activeStudent', 'activeStudentOverlap'):
+        if len(argv) != 6:
+            print("Usage: python3 project.py activeStudent [machineId:int] [N:int] [start_date:Date] [end:Date] [--overlap]")
+        else:
+            machine_id = argv[2]
+            num = argv[3]
+            start_date = argv[4]
+            end_date = argv[5]
+            activeStudents(connection, machine_id, start_date, end_date, num, command == 'activeStudentOverlap')
     elif command =='machineUsage':
-        if len(sys.argv) !=3:
+        if len(argv) !=3:
             print("Usage: project.py machineUsage [courseId: int]")
         else:
-            course_id = sys.argv[2]
+            course_id = argv[2]
             numMachineUsage(connection, course_id)
+    elif command in ('listCourses', 'adminEmailsMulti', 'machineUsageMatrix'):
+        args, options = parse_flags(argv[2:])
+        ids = collect_ids(args, options.get("file"))
+        if command == 'listCourses' and ids:
+            listCourses(connection, tuple(ids))
+        elif command == 'adminEmailsMulti' and ids:
+            adminEmailsMulti(connection, tuple(ids))
+        elif command == 'machineUsageMatrix':
+            machineUsageMatrix(connection, tuple(ids))
+        else:
+            print(f"Usage: python3 project.py {command} [id ...] [--file=idFile]")
+    elif command in ('snapshot', 'restore'):
+        args, options = parse_flags(argv[2:])
+        if len(args) != 1 or not re.fullmatch(r"[\w.-]+", args[0]):
+            print(f"Usage: python3 project.py {command} [name]" + (" [--folder=csvFolder]" if command == 'restore' else ""))
+        elif command == 'snapshot':
+            print("Success" if take_snapshot(connection, args[0]) else "Fail")
+        elif "folder" in options and (read_snapshot_info(args[0]) or {}).get("source_hash") != folder_source_hash(options["folder"]):
+            print("Fail")
+            print(f"Snapshot '{args[0]}' was not taken from the files in {options['folder']}")
+        else:
+            print("Success" if restore_snapshot(connection, args[0]) else "Fail")
+    elif command == 'export':
+        args, options = parse_flags(argv[2:])
+        file_format = options.get("format")
+        if (not args or "output" not in options or export_source(args[0], args[1:]) is None
+                or file_format not in EXPORT_FORMATS + [None]):
+            print("Usage: python3 project.py export [table | queryCommand [parameters]] --output=path [--format=parquet|arrow|npy] [--batch-size=N]")
+        else:
+            export(connection, args[0], args[1:], options["output"], file_format,
+                   int(options.get("batch-size", STREAM_BATCH_SIZE)))
+    elif command == 'deleteStudents':
+        args, options = parse_flags(argv[2:])
+        ucinetids = collect_ids(args, options.get("file")) if args or "file" in options else None
+        inactive_since = options.get("inactive-since")
+        if (not ucinetids and not inactive_since) or (inactive_since and not is_date(inactive_since)):
+            print("Usage: python3 project.py deleteStudents [UCINetID ...] [--file=idFile] [--inactive-since=YYYY-MM-DD] [--batch-size=N]")
+        else:
+            delete_students(connection, ucinetids, inactive_since, int(options.get("batch-size", DELETE_BATCH_SIZE)))
+    elif command == 'machineTimeline':
+        args, options = parse_flags(argv[2:])
+        dates = [options.get("start"), options.get("end")]
+        if not all(is_date(value) for value in dates if value):
+            print("Usage: python3 project.py machineTimeline [machineId ...] [--file=idFile] [--start=YYYY-MM-DD] [--end=YYYY-MM-DD] [--summary]")
+        else:
+            machineTimeline(connection, tuple(collect_ids(args, options.get("file"))), *dates, "summary" in options)
+    elif command in BULK_COMMANDS:
+        args, options = parse_flags(argv[2:])
+        if len(args) != 1:
+            print(f"Usage: python3 project.py {command} [csvFile] [--transaction-size=N] [--batch-size=N]")
+        else:
+            transaction_size = int(options.get("transaction-size", 0)) or None
+            bulk_insert(connection, command, args[0], transaction_size, int(options.get("batch-size", 1000)))
+    elif command == 'verify':
+        if len(argv) != 2:
+            print("Usage: python3 project.py verify")
+        else:
+            verify_course_popularity(connection)
+    elif command == 'cacheStats':
+        cache_stats()
+    elif command == 'explain':
+        query_command = argv[2] if len(argv) > 2 else None
+        if query_command not in QUERY_COMMANDS or len(argv) != 3 + QUERY_COMMANDS[query_command][1]:
+            print("Usage: python3 project.py explain [listCourse|popularCourse|adminEmails|activeStudent|machineUsage] [parameters] [--overlap]")
+        else:
+            explain(connection, query_command, argv[3:])
 
     # Add more elif blocks here for other commands like insertStudent, addEmail, etc.
     else:
         print("Invalid command")
 
+#--------------------------------------------------------------------------------------- Batch mode ----------------------------------------------------------------------------------------------------------------------------------------------------#
+# Commands that write one record; `serve --group-commit` sends these through its WritePipeline
+WRITE_COMMANDS = {'insertStudent', 'addEmail', 'deleteStudent', 'insertMachine', 'insertUse', 'updateCourse'}
+# Bulk writes commit their own batches (--transaction-size, --batch-size), so they never run inside a
+# group: batch mode commits the open group first and the server runs them on a pool connection
+BULK_WRITE_COMMANDS = {'insertStudents', 'addEmails', 'insertUses', 'deleteStudents'}
+
+
+# Connection wrapper that lets several write commands share one transaction. Each command runs
+# after a savepoint: its commit() keeps the work in the open group and its rollback() only undoes
+# that command, so every command still reports Success/Fail on its own.
+class GroupCommitConnection:
+    def __init__(self, connection, group_size):
+        self.connection = connection
+        self.group_size = group_size
+        self.pending = 0
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def begin_command(self):
+        cursor = self.connection.cursor()
+        cursor.execute("SAVEPOINT batch_command;")
+        cursor.close()
+
+    def commit(self):
+        self.pending += 1
+        if self.pending >= self.group_size:
+            self.flush()
+
+    def rollback(self):
+        cursor = self.connection.cursor()
+        cursor.execute("ROLLBACK TO SAVEPOINT batch_command;")
+        cursor.close()
+
+    def flush(self):
+        self.connection.commit()
+        self.pending = 0
+
+
+# Run commands read one per line from a file (or stdin for '-') over a single connection.
+# Lines use the same syntax as the command line, blank lines and lines starting with # are skipped.
+# With group_size > 1 consecutive write commands are committed together, group_size at a time.
+def run_batch(connection, file, group_size=1):
+    if group_size > 1:
+        connection = GroupCommitConnection(connection, group_size)
+
+    try:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            argv = ["project.py"] + shlex.split(line)
+            if len(argv) < 2:
+                continue
+            command_connection = connection
+            if group_size > 1 and argv[1] in BULK_WRITE_COMMANDS:
+                connection.flush()
+                command_connection = connection.connection
+            elif group_size > 1:
+                # Every command gets its own savepoint, so a rollback() in any of them only undoes that command
+                connection.begin_command()
+            try:
+                run_command(command_connection, argv)
+            except Exception as e:
+                # A command that raises fails on its own, the writes of earlier commands stay in the group
+                print("Fail")
+                print(f"The error '{e}' occurred")
+                try:
+                    command_connection.rollback()
+                except Error:
+                    pass
+            sys.stdout.flush()
+    finally:
+        if group_size > 1:
+            connection.flush()
+
+
+# Write commands from many threads (the request handlers of `serve --group-commit`) go through one
+# WritePipeline. Its writer thread runs them on a connection of its own in groups of at most max_group
+# commands, or as many as arrived within max_delay seconds of the first, and commits each group once.
+# Every command runs after a savepoint like in batch mode, so a failing command only undoes itself.
+# Callers get a command's output once its group has been committed; if that commit fails, every command
+# of the group reports Fail. The writer connection reuses one prepared statement per query.
+class WritePipeline:
+    def __init__(self, connect, max_group=64, max_delay=0.005):
+        self.connection = connect()
+        self.connection.reuse_prepared_statements()
+        self.max_group = max_group
+        self.max_delay = max_delay
+        self.requests = queue.Queue()
+        self.groups = 0
+        self.commands = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # Queue function(connection, *args); returns a Future of (printed output, return value)
+    def submit(self, function, *args):
+        import concurrent.futures
+        future = concurrent.futures.Future()
+        self.requests.put((function, args, future))
+        return future
+
+    def call(self, function, *args):
+        return self.submit(function, *args).result()
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            group = [request]
+            deadline = time.monotonic() + self.max_delay
+            while len(group) < self.max_group:
+                try:
+                    request = self.requests.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.requests.put(None)  # stop after this group
+                    break
+                group.append(request)
+            self.run_group(group)
+
+    def run_group(self, group):
+        # group_size past the end of the group: the commands' commit() calls never flush part of it
+        connection = GroupCommitConnection(self.connection, len(group) + 1)
+        INVALIDATIONS.tables = set()
+        results = []
+        for function, args, _ in group:
+            try:
+                connection.begin_command()
+                results.append(capture_output(function, connection, *args))
+            except Exception as e:
+                try:
+                    connection.rollback()
+                except Error:
+                    pass
+                results.append((f"The error '{e}' occurred\n", False))
+        try:
+            connection.flush()
+        except Error as e:
+            try:
+                self.connection.rollback()
+            except Error:
+                pass
+            results = [(f"Fail\nThe error '{e}' occurred\n", False)] * len(group)
+        tables = INVALIDATIONS.tables
+        INVALIDATIONS.tables = None
+        invalidate_cache(*tables)
+        self.groups += 1
+        self.commands += len(group)
+        for (_, _, future), result in zip(group, results):
+            future.set_result(result)
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+        self.connection.close()
+#--------------------------------------------------------------------------------------- End of Batch mode ----------------------------------------------------------------------------------------------------------------------------------------------------#
+
+
+#--------------------------------------------------------------------------------------- Server mode ----------------------------------------------------------------------------------------------------------------------------------------------------#
+# `serve` keeps a pool of open database connections and answers the usual commands over a Unix
+# socket or localhost TCP. Any other command forwards to a running server when it is given
+# --server=ADDR (or PROJECT_SERVER is set). ADDR is a socket path, or [host:]port for TCP.
+# The protocol is one JSON object per line: {"argv": [command, parameters...]} answered by {"output": text}.
+DEFAULT_SERVER_SOCKET = "/tmp/cs122a-project.sock"
+
+
+# A fixed set of open connections handed out to one thread at a time
+class ConnectionPool:
+    def __init__(self, connect, size):
+        self.connections = queue.Queue()
+        for _ in range(size):
+            self.connections.put(connect())
+
+    def get(self):
+        return self.connections.get()
+
+    # End whatever transaction the last command left open before the connection is reused. Commands
+    # commit their own writes; a read left open would keep its REPEATABLE READ snapshot and every later
+    # command on this connection would miss the writes other connections committed since.
+    def put(self, connection):
+        try:
+            connection.rollback()
+        except Error:
+            pass
+        self.connections.put(connection)
+
+    def close(self):
+        while not self.connections.empty():
+            self.connections.get().close()
+
+
+# sys.stdout replacement that sends prints of a thread to that thread's buffer while it is capturing.
+# The command functions print their results, so this is how concurrent requests keep their output apart.
+class ThreadLocalStdout:
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        return (buffer if buffer is not None else self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+STDOUT_LOCK = threading.Lock()
+
+
+# Run function(*args) and return (printed output, return value)
+def capture_output(function, *args):
+    with STDOUT_LOCK:
+        if not isinstance(sys.stdout, ThreadLocalStdout):
+            sys.stdout = ThreadLocalStdout(sys.stdout)
+    local = sys.stdout.local
+    previous = getattr(local, "buffer", None)
+    local.buffer = io.StringIO()
+    try:
+        result = function(*args)
+    finally:
+        output = local.buffer.getvalue()
+        local.buffer = previous
+    return output, result
+
+
+class CommandRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            argv = ["project.py"] + json.loads(line)["argv"]
+            if len(argv) < 2 or argv[1] in ("serve", "batch"):
+                output = "Invalid command\n"
+            elif self.server.pipeline is not None and argv[1] in WRITE_COMMANDS:
+                output, _ = self.server.pipeline.call(run_command, argv)
+            else:
+                connection = self.server.pool.get()
+                try:
+                    output, _ = capture_output(run_command, connection, argv)
+                except Exception as e:
+                    output = f"The error '{e}' occurred\n"
+                finally:
+                    self.server.pool.put(connection)
+            self.wfile.write((json.dumps({"output": output}) + "\n").encode())
+            self.wfile.flush()
+
+
+class ThreadingUnixCommandServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ThreadingTCPCommandServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+# Split a server address into ('unix', path) or ('tcp', (host, port))
+def parse_server_address(address):
+    if "/" in address:
+        return "unix", address
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+# With a WritePipeline the write commands of all clients are group-committed by its writer thread
+def serve(address, pool_size, connect, pipeline=None):
+    family, location = parse_server_address(address)
+    if family == "unix":
+        if os.path.exists(location):
+            os.remove(location)
+        server = ThreadingUnixCommandServer(location, CommandRequestHandler)
+    else:
+        server = ThreadingTCPCommandServer(location, CommandRequestHandler)
+    server.pool = ConnectionPool(connect, pool_size)
+    server.pipeline = pipeline
+    sys.stdout = ThreadLocalStdout(sys.stdout)
+    print(f"Serving on {address} with {pool_size} connections", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.close()
+        if pipeline is not None:
+            pipeline.close()
+        if family == "unix" and os.path.exists(location):
+            os.remove(location)
+
+
+# Thin client: send one command to a running server and print its output
+def forward_command(address, argv):
+    family, location = parse_server_address(address)
+    sock = socket.socket(socket.AF_UNIX if family == "unix" else socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.connect(location)
+        sock.sendall((json.dumps({"argv": argv}) + "\n").encode())
+        response = json.loads(sock.makefile('r').readline())
+    finally:
+        sock.close()
+    sys.stdout.write(response["output"])
+#--------------------------------------------------------------------------------------- End of Server mode ----------------------------------------------------------------------------------------------------------------------------------------------------#
+
+
+#--------------------------------------------------------------------------------------- Asyncio API ----------------------------------------------------------------------------------------------------------------------------------------------------#
+# Async versions of the command functions for asyncio callers. A call runs the sync function on a
+# worker thread with a pooled connection of its own, so up to `size` calls reach the database at the
+# same time while the event loop stays free. Every async function returns (printed output, result):
+#
+#     pool = AsyncConnectionPool(lambda: create_database_connection(*DB_CONFIG), 8)
+#     results = await gather_bounded([async_listCourse(pool, id) for id in ids], 16)
+#
+# asyncio is imported where it is used so the command-line startup doesn't pay for it.
+class AsyncConnectionPool:
+    def __init__(self, connect, size):
+        import asyncio
+        import concurrent.futures
+        self.pool = ConnectionPool(connect, size)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=size)
+        self.slots = asyncio.Semaphore(size)  # a waiting call never holds a worker thread
+
+    def call(self, function, *args):
+        connection = self.pool.get()
+        try:
+            return capture_output(function, connection, *args)
+        finally:
+            self.pool.put(connection)
+
+    async def run(self, function, *args):
+        import asyncio
+        async with self.slots:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self.call, function, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+# Turn a command function taking (connection, ...) into a coroutine function taking (pool, ...)
+def async_command(function):
+    @functools.wraps(function)
+    async def wrapper(pool, *args):
+        return await pool.run(function, *args)
+    return wrapper
+
+
+# Await coroutines with at most `limit` of them in flight, results in the order given
+async def gather_bounded(coroutines, limit):
+    import asyncio
+    gate = asyncio.Semaphore(limit)
+
+    async def bounded(coroutine):
+        async with gate:
+            return await coroutine
+
+    return await asyncio.gather(*(bounded(coroutine) for coroutine in coroutines))
+
+
+async_import_data = async_command(lambda connection, folder_name, *args: import_data(folder_name, connection, *args))
+async_import_delta = async_command(lambda connection, folder_name, *args: import_delta(folder_name, connection, *args))
+async_insert_student = async_command(insert_student)
+async_add_email = async_command(add_email)
+async_delete_student = async_command(delete_student)
+async_insert_machine = async_command(insert_machine)
+async_insert_use = async_command(insert_use)
+async_updateCourse = async_command(updateCourse)
+async_listCourse = async_command(listCourse)
+async_popularCourse = async_command(popularCourse)
+async_adminEmail = async_command(adminEmail)
+async_activeStudents = async_command(activeStudents)
+async_numMachineUsage = async_command(numMachineUsage)
+async_listCourses = async_command(listCourses)
+async_adminEmailsMulti = async_command(adminEmailsMulti)
+async_machineUsageMatrix = async_command(machineUsageMatrix)
+async_machineTimeline = async_command(machineTimeline)
+async_verify_course_popularity = async_command(verify_course_popularity)
+async_explain = async_command(explain)
+async_bulk_insert = async_command(bulk_insert)
+async_delete_students = async_command(delete_students)
+# Any command line, e.g. await async_run_command(pool, ["project.py", "popularCourse", "5"])
+async_run_command = async_command(run_command)
+#--------------------------------------------------------------------------------------- End of Asyncio API ----------------------------------------------------------------------------------------------------------------------------------------------------#
+
+
+# Run the command of the command line: a batch of commands or a single one
+def run_main_command(connection):
+    if sys.argv[1] == "batch":
+        args, options = parse_flags(sys.argv[2:])
+        if len(args) > 1:
+            print("Usage: python3 project.py batch [commandFile|-] [--transaction=N] [--cache [--cache-size=N] [--cache-ttl=S] [--cache-mb=M]]")
+            return
+        configure_cache(options)
+        group_size = int(options.get("transaction", 1))
+        if not args or args[0] == "-":
+            run_batch(connection, sys.stdin, group_size)
+        else:
+            with open(args[0], 'r') as file:
+                run_batch(connection, file, group_size)
+    else:
+        run_command(connection, sys.argv)
+
+
+# Main function to parse command-line arguments and call the appropriate function
+def main():
+    # Options accepted by every command:
+    #   --server=ADDR (or PROJECT_SERVER) forwards the command to a running `serve` process
+    #   --backend=mysql|sqlite and --db=path select the storage backend
+    #   --profile[=file] and --profile-slow=ms record a JSON profile of the command
+    global_options = {}
+    for arg in list(sys.argv[2:]):
+        key = arg[2:].partition("=")[0]
+        if arg.startswith("--") and key in ("server", "backend", "db", "profile", "profile-slow"):
+            global_options[key] = arg.partition("=")[2]
+            sys.argv.remove(arg)
+    server_address = global_options.get("server", os.environ.get("PROJECT_SERVER"))
+    configure_backend(global_options)
+
+    if len(sys.argv) < 2:
+        print("Usage: python3 project.py <function name> [parameters]")
+        return
+
+    if server_address and sys.argv[1] != "serve":
+        forward_command(server_address, sys.argv[1:])
+        return
+
+    if sys.argv[1] == "serve":
+        args, options = parse_flags(sys.argv[2:])
+        if args:
+            print("Usage: python3 project.py serve [--socket=path | --port=N] [--pool-size=N] [--cache [--cache-size=N] [--cache-ttl=S] [--cache-mb=M]] [--group-commit [--group-size=N] [--group-delay=ms]]")
+            return
+        configure_cache(options)
+        address = str(options["port"]) if "port" in options else options.get("socket", DEFAULT_SERVER_SOCKET)
+        connect = lambda: create_database_connection(*DB_CONFIG)
+        pipeline = None
+        if "group-commit" in options:
+            pipeline = WritePipeline(connect, int(options.get("group-size", 64)), float(options.get("group-delay", 5)) / 1000)
+        serve(address, int(options.get("pool-size", 8)), connect, pipeline)
+        return
+
+    global PROFILER
+    start = time.perf_counter()
+    if "profile" in global_options:
+        PROFILER = Profiler(float(global_options.get("profile-slow") or 100) / 1000)
+
+    connection = LazyConnection(lambda: create_database_connection(*DB_CONFIG))
+
+    try:
+        run_main_command(connection)
+    finally:
+        if PROFILER is not None:
+            write_profile(global_options["profile"], PROFILER.report(sys.argv, time.perf_counter() - start, connection))
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
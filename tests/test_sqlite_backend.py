@@ -0,0 +1,325 @@
+# The commands run against the embedded SQLite backend on a copy of test_data, so they can be checked
+# without a MySQL server: python3 -m pytest tests (or python3 -m unittest discover tests)
+import contextlib
+import datetime
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import project
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TEST_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_data")
+
+
+class SQLiteCommandTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.folder = os.path.join(self.directory, "test_data")
+        shutil.copytree(TEST_DATA, self.folder)
+        self.connection = project.create_database_connection(None, None, None, os.path.join(self.directory, "test.db"), "sqlite")
+        self.assertEqual(self.run_command("import", self.folder), ["20,6,5"])
+
+    def tearDown(self):
+        self.connection.close()
+        shutil.rmtree(self.directory)
+
+    # Output lines of one command
+    def run_command(self, *argv):
+        output, _ = project.capture_output(project.run_command, self.connection, ["project.py", *argv])
+        return output.splitlines()
+
+    def append_rows(self, file_name, *lines):
+        path = os.path.join(self.folder, file_name)
+        with open(path, 'r') as file:
+            content = file.read()
+        with open(path, 'w') as file:
+            file.write(content + ("" if content.endswith("\n") else "\n") + "\n".join(lines) + "\n")
+
+    # Rewrite a CSV file of the import folder, edit gets and returns its lines
+    def edit_rows(self, file_name, edit):
+        path = os.path.join(self.folder, file_name)
+        with open(path, 'r') as file:
+            lines = file.read().splitlines()
+        with open(path, 'w') as file:
+            file.write("\n".join(edit(lines)) + "\n")
+
+    # import --incremental --stats, returns its stats lines
+    def import_incremental(self):
+        stats = io.StringIO()
+        with contextlib.redirect_stderr(stats):
+            output = self.run_command("import", self.folder, "--incremental", "--stats")
+        self.assertEqual(len(output), 1)
+        return stats.getvalue().splitlines()
+
+    def rows(self, query, params=()):
+        cursor = self.connection.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return [tuple(map(str, row)) for row in rows]
+
+    def count(self, query, params=()):
+        cursor = self.connection.cursor()
+        cursor.execute(query, params)
+        count = cursor.fetchone()[0]
+        cursor.close()
+        return count
+
+    def test_import(self):
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Users"), 20)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Machines"), 6)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Courses"), 5)
+        # The unquoted NULL in users.csv is loaded as the string 'NULL'
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Users WHERE UCINetID = 'mchang13' AND MiddleName = 'NULL'"), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.folder, project.REJECTS_FILE)))
+
+    def test_import_is_repeatable(self):
+        self.assertEqual(self.run_command("import", self.folder), ["20,6,5"])
+        self.assertEqual(self.run_command("import", self.folder, "--incremental"), ["20,6,5"])
+
+    def test_import_rejects_dangling_references(self):
+        # Keys match the way the database compares them, whatever their case and trailing spaces
+        self.append_rows("emails.csv", "MCHANG13,upper@uci.edu", "mchang13 ,space@uci.edu", "nobody,nobody@uci.edu")
+        self.assertEqual(self.run_command("import", self.folder), ["20,6,5"])
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Emails WHERE email_address IN ('upper@uci.edu', 'space@uci.edu')"), 2)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Emails WHERE email_address = 'nobody@uci.edu'"), 0)
+        with open(os.path.join(self.folder, project.REJECTS_FILE)) as file:
+            rejects = file.read().splitlines()
+        self.assertEqual(len(rejects), 2)
+        self.assertIn("UCINetID 'nobody' not found in Users", rejects[1])
+
+    def test_incremental_import(self):
+        self.edit_rows("users.csv", lambda lines: [line.replace("jkelley17,Jasmine,", "jkelley17,Jasmine Ann,") for line in lines]
+                       + ["newuser1,New,NULL,User"])
+        self.edit_rows("courses.csv", lambda lines: lines + ["9,Compilers,F24"])
+        self.edit_rows("use.csv", lambda lines: [line for line in lines if not line.startswith("2,jkelley17,3,")]
+                       + ["1,jkelley17,2,2024-01-01,2024-01-05"])
+        stats = self.import_incremental()
+        # NULL and dates compare the way they were loaded, so unchanged rows of a changed file are no updates
+        self.assertEqual(stats, ["Users: 1 inserted, 1 updated, 0 deleted",
+                                 "Admins: 0 inserted, 0 updated, 0 deleted",
+                                 "Students: 0 inserted, 0 updated, 0 deleted",
+                                 "Emails: 0 inserted, 0 updated, 0 deleted",
+                                 "Courses: 1 inserted, 0 updated, 0 deleted",
+                                 "Projects: 0 inserted, 0 updated, 0 deleted",
+                                 "Machines: unchanged",
+                                 "StudentUse: 1 inserted, 0 updated, 1 deleted",
+                                 "Manage: 0 inserted, 0 updated, 0 deleted"])
+        self.assertEqual(self.rows("SELECT * FROM Users WHERE UCINetID IN ('jkelley17', 'newuser1') ORDER BY UCINetID"),
+                         [("jkelley17", "Jasmine Ann", "NULL", "Kelley"), ("newuser1", "New", "NULL", "User")])
+        self.assertEqual(self.rows("SELECT * FROM StudentUse WHERE UCINetID = 'jkelley17' ORDER BY project_id"),
+                         [("1", "jkelley17", "2", "2024-01-01", "2024-01-05"), ("5", "jkelley17", "6", "2020-03-09", "2020-03-10")])
+        self.assertEqual(self.rows("SELECT title FROM Courses WHERE course_id = '9'"), [("Compilers",)])
+        self.assertEqual(self.run_command("verify"), ["Success"])
+        # Nothing changed since
+        self.assertEqual(set(line.split(": ")[1] for line in self.import_incremental()), {"unchanged"})
+
+    def test_incremental_import_deletes_children_of_removed_rows(self):
+        uses = self.count("SELECT COUNT(*) FROM StudentUse WHERE UCINetID = 'mchang13'")
+        emails = self.count("SELECT COUNT(*) FROM Emails WHERE UCINetID = 'mchang13'")
+        # Only users.csv changes; the rows referencing mchang13 in the other files become rejects
+        self.edit_rows("users.csv", lambda lines: [line for line in lines if not line.startswith("mchang13,")])
+        stats = self.import_incremental()
+        self.assertIn("Users: 0 inserted, 0 updated, 1 deleted", stats)
+        self.assertIn("Students: 0 inserted, 0 updated, 1 deleted", stats)
+        self.assertIn(f"Emails: 0 inserted, 0 updated, {emails} deleted", stats)
+        self.assertIn(f"StudentUse: 0 inserted, 0 updated, {uses} deleted", stats)
+        for table in ("Users", "Students", "Emails", "StudentUse", "CourseStudents"):
+            self.assertEqual(self.count(f"SELECT COUNT(*) FROM {table} WHERE UCINetID = 'mchang13'"), 0)
+        self.assertEqual(self.run_command("verify"), ["Success"])
+
+    def test_insert_student(self):
+        self.assertEqual(self.run_command("insertStudent", "testu1", "testu1@uci.edu", "Test", "NULL", "User"), ["Success"])
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Students WHERE UCINetID = %s", ("testu1",)), 1)
+        self.assertEqual(self.run_command("insertStudent", "mchang13", "x@uci.edu", "A", "B", "C"), ["Fail"])
+
+    def test_add_email(self):
+        self.assertEqual(self.run_command("addEmail", "mchang13", "new@uci.edu"), ["Success"])
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Emails WHERE email_address = %s", ("new@uci.edu",)), 1)
+        self.assertEqual(self.run_command("addEmail", "nobody", "x@uci.edu")[-1], "Fail")
+
+    def test_delete_student(self):
+        self.run_command("insertStudent", "testu1", "testu1@uci.edu", "Test", "NULL", "User")
+        self.assertEqual(self.run_command("deleteStudent", "testu1"), ["Success"])
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Users WHERE UCINetID = %s", ("testu1",)), 0)
+        self.assertEqual(self.run_command("deleteStudent", "testu1"), ["Fail"])
+        # Students with machine uses are still referenced by StudentUse
+        self.assertEqual(self.run_command("deleteStudent", "mchang13")[0], "Fail")
+
+    def test_insert_machine(self):
+        self.assertEqual(self.run_command("insertMachine", "77", "host77", "10.0.0.7", "Active", "DBH 1"), ["Success"])
+        self.assertEqual(self.run_command("insertMachine", "77", "host77", "10.0.0.7", "Active", "DBH 1")[0], "Fail")
+
+    def test_insert_use(self):
+        self.assertEqual(self.run_command("insertUse", "1", "jkelley17", "2", "2024-01-01", "2024-01-05"), ["Success"])
+        self.assertEqual(self.count("SELECT COUNT(*) FROM StudentUse WHERE UCINetID = %s AND machine_id = %s", ("jkelley17", "2")), 1)
+        self.assertEqual(self.run_command("insertUse", "1", "nobody", "2", "2024-01-01", "2024-01-05")[0], "Fail")
+
+    def test_update_course(self):
+        self.assertEqual(self.run_command("updateCourse", "1", "New Title"), ["Success"])
+        self.assertEqual(self.run_command("listCourse", "mchang13")[0], "1,New Title,F23")
+
+    def test_list_course(self):
+        expected = ["1,Computer Graphics,F23",
+                    "4,Introduction to Data Management,S24",
+                    "5,Project in Databases and Web Applications,S24"]
+        self.assertEqual(self.run_command("listCourse", "mchang13"), expected)
+        # Text compares case-insensitively, like MySQL's default collation
+        self.assertEqual(self.run_command("listCourse", "MCHANG13"), expected)
+
+    def test_fetch_by_keys_sorts_across_chunks(self):
+        cursor = self.connection.cursor()
+        rows = project.fetch_by_keys(cursor, project.LIST_COURSES_QUERY, ["mchang13", "jkelley17", "bgarcia19", "MCHANG13"], chunk_size=1)
+        cursor.close()
+        self.assertEqual([row[0] for row in rows], sorted(row[0] for row in rows))
+        self.assertEqual(len(rows), len(set(rows)))
+        self.assertEqual(self.run_command("listCourses", "mchang13", "jkelley17")[0].split(",")[0], "jkelley17")
+
+    def test_popular_course(self):
+        self.assertEqual(self.run_command("popularCourse", "3"),
+                         ["4,Introduction to Data Management,7",
+                          "5,Project in Databases and Web Applications,5",
+                          "2,Computational Photography & Vision,3"])
+
+    def test_admin_emails(self):
+        self.assertEqual(self.run_command("adminEmails", "1"),
+                         ["jtrujillo2,Jorge,NULL,Trujillo,jessicapadilla@gmail.com;jrodriguez@yahoo.com;salazarmaria@yahoo.com;sallywalker@gmail.com;udavis@hotmail.com",
+                          "rmurphy10,Richard,NULL,Murphy,david17@yahoo.com;turnerjessica@gmail.com"])
+
+    def test_active_student(self):
+        self.assertEqual(self.run_command("activeStudent", "1", "1", "2020-01-01", "2020-12-31"),
+                         ["bgarcia19,Benjamin,NULL,Garcia", "mchang13,Megan,NULL,Chang"])
+
+    def test_machine_usage(self):
+        self.assertEqual(self.run_command("machineUsage", "1"),
+                         ["6,compute3,192.168.20.3,0", "5,compute2,192.168.20.2,0", "4,compute1,192.168.20.1,0",
+                          "3,gpu3,192.168.10.3,0", "2,gpu2,192.168.10.2,0", "1,gpu1,192.168.10.1,1"])
+
+    def test_bulk_insert_keeps_committed_transactions(self):
+        path = os.path.join(self.directory, "uses.csv")
+        with open(path, 'w') as file:
+            file.write("1,jkelley17,2,2024-01-01,2024-01-05\n1,nobody,2,2024-01-01,2024-01-05\n1,jkelley17,3,2024-01-01,2024-01-05\n")
+        refresh_course_students = project.refresh_course_students
+        calls = []
+
+        # The second transaction fails when it is committed
+        def failing_refresh(cursor, ucinetids):
+            calls.append(ucinetids)
+            if len(calls) == 2:
+                raise project.Error("lock wait timeout")
+            refresh_course_students(cursor, ucinetids)
+
+        project.refresh_course_students = failing_refresh
+        try:
+            report = self.run_command("insertUses", path, "--transaction-size=2")
+        finally:
+            project.refresh_course_students = refresh_course_students
+        self.assertEqual(report[0], "1,Success")
+        self.assertTrue(report[1].startswith("2,Fail,"))
+        self.assertEqual(report[2], "3,Fail,not committed: lock wait timeout")
+        self.assertEqual(self.count("SELECT COUNT(*) FROM StudentUse WHERE UCINetID = 'jkelley17' AND project_id = '1'"), 1)
+        self.assertEqual(self.run_command("verify"), ["Success"])
+
+    def test_delete_students(self):
+        counts = [self.count(f"SELECT COUNT(*) FROM {table} WHERE UCINetID IN ('mchang13', 'jkelley17')")
+                  for table in ("StudentUse", "Emails")]
+        self.assertEqual(self.run_command("deleteStudents", "mchang13", "jkelley17", "nobody", "--batch-size=1"),
+                         [f"StudentUse,{counts[0]}", f"Emails,{counts[1]}", "Students,2", "Users,2"])
+        for table in ("Users", "Students", "Emails", "StudentUse", "CourseStudents"):
+            self.assertEqual(self.count(f"SELECT COUNT(*) FROM {table} WHERE UCINetID IN ('mchang13', 'jkelley17')"), 0)
+        self.assertEqual(self.run_command("verify"), ["Success"])
+
+    def test_delete_inactive_students(self):
+        # mchang13 and jtrujillo2 have no use ending after 2020-03-01, ageorge20, sbrennan18 and jjohnson15 none at all;
+        # jtrujillo2 and ageorge20 are admins and keep their Users and Emails rows
+        self.assertEqual(self.run_command("deleteStudents", "--inactive-since=2020-03-01"),
+                         ["StudentUse,5", "Emails,24", "Students,5", "Users,3"])
+        self.assertEqual(self.rows("SELECT UCINetID FROM Users WHERE UCINetID IN ('mchang13', 'jtrujillo2', 'ageorge20', 'sbrennan18', 'jjohnson15') ORDER BY UCINetID"),
+                         [("ageorge20",), ("jtrujillo2",)])
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Students"), 10)
+        self.assertEqual(self.run_command("verify"), ["Success"])
+
+    def test_delete_listed_inactive_students(self):
+        # Only the listed students that are also inactive: jkelley17 used a machine after 2020-03-01
+        self.assertEqual(self.run_command("deleteStudents", "mchang13", "jkelley17", "--inactive-since=2020-03-01")[2:],
+                         ["Students,1", "Users,1"])
+        self.assertEqual(self.rows("SELECT UCINetID FROM Students WHERE UCINetID IN ('mchang13', 'jkelley17')"), [("jkelley17",)])
+        self.assertEqual(self.run_command("verify"), ["Success"])
+
+    def test_delete_student_who_is_admin(self):
+        emails = self.count("SELECT COUNT(*) FROM Emails WHERE UCINetID = 'jtrujillo2'")
+        self.assertEqual(self.run_command("deleteStudents", "jtrujillo2"), ["StudentUse,1", "Emails,0", "Students,1", "Users,0"])
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Students WHERE UCINetID = 'jtrujillo2'"), 0)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Users WHERE UCINetID = 'jtrujillo2'"), 1)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM Emails WHERE UCINetID = 'jtrujillo2'"), emails)
+        self.assertEqual(self.run_command("adminEmails", "1")[0].split(",")[0], "jtrujillo2")
+        self.assertEqual(self.run_command("verify"), ["Success"])
+
+    @unittest.skipIf(numpy is None, "machineTimeline needs NumPy")
+    def test_machine_timeline(self):
+        # Machine 1's use runs 2020-06-02 to 06-04, clipped at --start; machine 5 has no uses
+        self.assertEqual(self.run_command("machineTimeline", "1", "5", "--start=2020-06-03", "--end=2020-06-05"),
+                         ["1,2020-06-03,1", "1,2020-06-04,1", "1,2020-06-05,0",
+                          "5,2020-06-03,0", "5,2020-06-04,0", "5,2020-06-05,0"])
+        self.assertEqual(self.run_command("machineTimeline", "4", "--summary"), ["4,2,2020-01-23,15,158"])
+
+    def test_verify(self):
+        self.assertEqual(self.run_command("verify"), ["Success"])
+        self.run_command("insertUse", "1", "jkelley17", "2", "2024-01-01", "2024-01-05")
+        self.run_command("insertStudent", "testu1", "testu1@uci.edu", "Test", "NULL", "User")
+        self.run_command("deleteStudent", "testu1")
+        self.assertEqual(self.run_command("verify"), ["Success"])
+
+
+
+@unittest.skipIf(numpy is None, "machineTimeline needs NumPy")
+class SweepLineConcurrencyTest(unittest.TestCase):
+    # Concurrency of every machine and day counted one day at a time
+    def brute_force(self, machine_count, uses, first, last):
+        days = (last - first).days + 1
+        counts = [[0] * days for _ in range(machine_count)]
+        for row, start, end in uses:
+            for day in range(days):
+                if row >= 0 and start <= first + datetime.timedelta(days=day) <= end:
+                    counts[row][day] += 1
+        return counts
+
+    def sweep(self, machine_count, uses, first, last):
+        rows = numpy.array([row for row, _, _ in uses], dtype=numpy.int64)
+        starts = numpy.array([start for _, start, _ in uses], dtype='datetime64[D]')
+        ends = numpy.array([end for _, _, end in uses], dtype='datetime64[D]')
+        return project.sweep_line_concurrency(numpy, machine_count, rows, starts, ends,
+                                              numpy.datetime64(first, 'D'), numpy.datetime64(last, 'D')).tolist()
+
+    def test_matches_brute_force(self):
+        generator = random.Random(122)
+        base = datetime.date(2020, 1, 1)
+        for _ in range(50):
+            # Machine 4 of 5 never gets a use, -1 is a use of a machine that isn't reported
+            uses = []
+            for _ in range(generator.randint(0, 40)):
+                start = base + datetime.timedelta(days=generator.randint(0, 60))
+                uses.append((generator.choice([-1, 0, 1, 2, 3]), start, start + datetime.timedelta(days=generator.randint(0, 20))))
+            # Windows that clip uses at both ends, and uses running past the window
+            first = base + datetime.timedelta(days=generator.randint(0, 40))
+            last = first + datetime.timedelta(days=generator.randint(0, 30))
+            self.assertEqual(self.sweep(5, uses, first, last), self.brute_force(5, uses, first, last))
+
+    def test_window_without_uses(self):
+        uses = [(0, datetime.date(2020, 1, 1), datetime.date(2020, 1, 3))]
+        self.assertEqual(self.sweep(2, uses, datetime.date(2020, 2, 1), datetime.date(2020, 2, 3)), [[0, 0, 0], [0, 0, 0]])
+        self.assertEqual(self.sweep(2, [], datetime.date(2020, 2, 1), datetime.date(2020, 2, 2)), [[0, 0], [0, 0]])
+
+
+if __name__ == "__main__":
+    unittest.main()